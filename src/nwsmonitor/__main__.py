@@ -6,6 +6,8 @@ import asyncio
 from sys import exit
 from tendo import singleton
 from .nwsmonitor import bot
+from . import aio_nws as nws
+from . import scheduler
 
 
 def main():
@@ -45,6 +47,14 @@ def main():
             log_params["filename"] = config["log_file"]
             log_params["filemode"] = "a"
             logging.captureWarnings(True)
+        if config.get("base_urls") is not None:
+            nws.set_base_urls(**config["base_urls"])
+        if config.get("resilience") is not None:
+            nws.resilience.configure(**config["resilience"])
+        for host, limits in config.get("rate_limits", {}).items():
+            nws.ratelimit.configure_host(host, **limits)
+        if config.get("polling") is not None:
+            scheduler.configure(**config["polling"])
     if args.verbose:
         log_params["level"] = logging.DEBUG
     else:
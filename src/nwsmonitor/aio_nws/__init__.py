@@ -1,2 +1,8 @@
 from .nws import *
-from . import spc
\ No newline at end of file
+from .alert import Alert
+from . import spc
+from . import session
+from . import resilience
+from . import ratelimit
+from . import gazetteer
+from . import vtec
@@ -0,0 +1,161 @@
+"""A compact record for a single alert."""
+
+import re
+import datetime
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+from pandas import DataFrame
+from .vtec import HVtec, Vtec, parse_all
+
+# API field name -> attribute name
+FIELDS = {
+    "id": "id",
+    "areaDesc": "area_desc",
+    "sent": "sent",
+    "onset": "onset",
+    "ends": "ends",
+    "messageType": "message_type",
+    "event": "event",
+    "senderName": "sender_name",
+    "headline": "headline",
+    "description": "description",
+    "instruction": "instruction",
+    "parameters": "parameters",
+    "expires": "expires",
+    "status": "status",
+}
+# Attribute name -> alert parameter. Only the first value of each is kept.
+THREAT_PARAMETERS = {
+    "tornado": "tornadoDetection",
+    "tor_damage_threat": "tornadoDamageThreat",
+    "wind_threat": "windThreat",
+    "max_wind": "maxWindGust",
+    "hail_threat": "hailThreat",
+    "max_hail": "maxHailSize",
+    "tstm_damage_threat": "thunderstormDamageThreat",
+    "flash_flood": "flashFloodDetection",
+    "ff_damage_threat": "flashFloodDamageThreat",
+    "snow_squall": "snowSquallDetection",
+    "snow_squall_impact": "snowSquallImpact",
+    "nws_headline": "NWSheadline",
+    "eas_org": "EAS-ORG",
+}
+# Wording in the headline, description or instruction -> tag
+TEXT_TAGS = {
+    "PARTICULARLY DANGEROUS SITUATION": "pds",
+    "EXTREMELY DANGEROUS SITUATION": "eds",
+    "TORNADO EMERGENCY": "tornado_emergency",
+    "FLASH FLOOD EMERGENCY": "flash_flood_emergency",
+    "DESTRUCTIVE": "destructive",
+    "CATASTROPHIC": "catastrophic",
+}
+# One alternation for every phrase, so the text is only scanned once no
+# matter how many phrases there are. Words may be split across lines.
+_TAG_PATTERN = re.compile(
+    r"\b(?:"
+    + "|".join(r"\s+".join(map(re.escape, phrase.split())) for phrase in TEXT_TAGS)
+    + r")\b",
+    re.IGNORECASE,
+)
+
+
+def text_tags(*texts: Optional[str]) -> FrozenSet[str]:
+    """The tags for every phrase in `TEXT_TAGS` found in the given texts."""
+    tags = set()
+    for text in texts:
+        if text:
+            for match in _TAG_PATTERN.finditer(text):
+                tags.add(TEXT_TAGS[" ".join(match.group().upper().split())])
+    return frozenset(tags)
+
+
+def _time(value: Any) -> Optional[datetime.datetime]:
+    if not isinstance(value, str):
+        return None
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def _clean(value: Any) -> Any:
+    # Missing values come back as NaN from DataFrames.
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+class Alert:
+    """
+    One alert, with timestamps, VTEC and threat parameters parsed once up
+    front. Attributes are the snake_case versions of the API fields.
+    `version` is a fingerprint of the alert's content, if the caller knows it.
+    """
+
+    __slots__ = (
+        *FIELDS.values(),
+        "sent_time",
+        "onset_time",
+        "ends_time",
+        "expires_time",
+        "vtec",
+        "vtecs",
+        "hvtec",
+        "version",
+        "_tags",
+        *THREAT_PARAMETERS,
+    )
+
+    def __init__(self, **fields: Any) -> None:
+        for name in FIELDS.values():
+            setattr(self, name, _clean(fields.get(name)))
+        if not isinstance(self.parameters, dict):
+            self.parameters = {}
+        self.sent_time = _time(self.sent)
+        self.onset_time = _time(self.onset)
+        self.ends_time = _time(self.ends)
+        self.expires_time = _time(self.expires)
+        vtecs = self.parameters.get("VTEC")
+        pvtecs, hvtecs = parse_all(
+            v for v in (vtecs if isinstance(vtecs, list) else []) if isinstance(v, str)
+        )
+        self.vtecs: Tuple[Vtec, ...] = tuple(pvtecs)
+        self.vtec = pvtecs[0] if pvtecs else None
+        self.hvtec: Optional[HVtec] = hvtecs[0] if hvtecs else None
+        self.version: Optional[str] = None
+        self._tags: Optional[FrozenSet[str]] = None
+        for name, parameter in THREAT_PARAMETERS.items():
+            try:
+                value = self.parameters[parameter][0]
+            except (KeyError, IndexError, TypeError):
+                value = None
+            setattr(self, name, value)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Alert":
+        """Build an alert from a dict keyed by API field names."""
+        return cls(**{name: data.get(field) for field, name in FIELDS.items()})
+
+    @classmethod
+    def from_frame(cls, frame: DataFrame) -> List["Alert"]:
+        return [cls.from_dict(row) for row in frame.to_dict("records")]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The alert as a dict keyed by API field names."""
+        return {field: getattr(self, name) for field, name in FIELDS.items()}
+
+    @property
+    def tags(self) -> FrozenSet[str]:
+        """Tags from `TEXT_TAGS` for wording in the alert's text."""
+        if self._tags is None:
+            self._tags = text_tags(
+                self.nws_headline, self.description, self.instruction
+            )
+        return self._tags
+
+    @property
+    def is_test(self) -> bool:
+        # "isTest" IS NOT AN OFFICIAL PARAMETER
+        return bool(self.parameters.get("isTest")) or self.status != "Actual"
+
+    def __repr__(self) -> str:
+        return f"<Alert {self.id} {self.event!r} from {self.sender_name!r}>"
@@ -0,0 +1,185 @@
+"""In-memory spatial index over the currently active alerts."""
+
+import re
+import math
+import time
+import logging
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+# Extra fields needed to place an alert on the map.
+INDEX_FIELDS = ("geometry", "geocode")
+CELL_SIZE = 1.0  # degrees
+_log = logging.getLogger(__name__)
+_PAIR = re.compile(r"(-?\d+(?:\.\d+)?)\s+(-?\d+(?:\.\d+)?)")
+_RING = re.compile(r"\(([^()]+)\)")
+
+Ring = List[Tuple[float, float]]  # (lon, lat) pairs
+Polygon = List[Ring]  # exterior ring first, then holes
+BBox = Tuple[float, float, float, float]  # min lon, min lat, max lon, max lat
+
+
+def _wkt_polygons(wkt: str) -> List[Polygon]:
+    """Parse a WKT POLYGON or MULTIPOLYGON."""
+    polygons = []
+    # Each polygon is "((ring), (ring), ...)".
+    for body in re.findall(r"\((\([^()]+\)(?:\s*,\s*\([^()]+\))*)\)", wkt):
+        polygons.append(
+            [
+                [(float(x), float(y)) for x, y in _PAIR.findall(ring)]
+                for ring in _RING.findall(body)
+            ]
+        )
+    return polygons
+
+
+def polygons(geometry: Any) -> List[Polygon]:
+    """Polygons from a WKT string or a GeoJSON geometry."""
+    if not geometry:
+        return []
+    if isinstance(geometry, str):
+        return _wkt_polygons(geometry)
+    if isinstance(geometry, dict):
+        coordinates = geometry.get("coordinates") or []
+        if geometry.get("type") == "Polygon":
+            coordinates = [coordinates]
+        elif geometry.get("type") != "MultiPolygon":
+            return []
+        return [
+            [[(float(x), float(y)) for x, y, *_ in ring] for ring in polygon]
+            for polygon in coordinates
+        ]
+    return []
+
+
+def _bbox(polygon: Polygon) -> BBox:
+    xs = [x for x, _ in polygon[0]]
+    ys = [y for _, y in polygon[0]]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def _in_ring(x: float, y: float, ring: Ring) -> bool:
+    inside = False
+    j = len(ring) - 1
+    for i in range(len(ring)):
+        xi, yi = ring[i]
+        xj, yj = ring[j]
+        if (yi > y) != (yj > y) and x < (xj - xi) * (y - yi) / (yj - yi) + xi:
+            inside = not inside
+        j = i
+    return inside
+
+
+def contains(polygon: Polygon, x: float, y: float) -> bool:
+    if not polygon or not _in_ring(x, y, polygon[0]):
+        return False
+    return not any(_in_ring(x, y, hole) for hole in polygon[1:])
+
+
+def _cells(bbox: BBox) -> Iterable[Tuple[int, int]]:
+    min_x, min_y, max_x, max_y = bbox
+    for i in range(math.floor(min_x / CELL_SIZE), math.floor(max_x / CELL_SIZE) + 1):
+        for j in range(
+            math.floor(min_y / CELL_SIZE), math.floor(max_y / CELL_SIZE) + 1
+        ):
+            yield i, j
+
+
+class AlertIndex:
+    """
+    Alerts with a polygon are found with a grid of bounding boxes; alerts
+    without one are found by the UGC zones they cover.
+    """
+
+    def __init__(self) -> None:
+        self.alerts: Dict[str, dict] = {}
+        self.shapes: Dict[str, List[Tuple[BBox, Polygon]]] = {}
+        self.grid: Dict[Tuple[int, int], Set[str]] = defaultdict(set)
+        self.zones: Dict[str, Set[str]] = defaultdict(set)
+        self.updated: Optional[float] = None
+        self.hits = 0
+        self.fallbacks = 0
+
+    def _add(self, alert_id: str, alert: dict) -> None:
+        self.alerts[alert_id] = alert
+        shapes = [(_bbox(p), p) for p in polygons(alert.get("geometry")) if p]
+        if shapes:
+            self.shapes[alert_id] = shapes
+            for bbox, _ in shapes:
+                for cell in _cells(bbox):
+                    self.grid[cell].add(alert_id)
+            return
+        for ugc in (alert.get("geocode") or {}).get("UGC") or []:
+            self.zones[ugc].add(alert_id)
+
+    def _remove(self, alert_id: str) -> None:
+        alert = self.alerts.pop(alert_id)
+        for bbox, _ in self.shapes.pop(alert_id, []):
+            for cell in _cells(bbox):
+                ids = self.grid[cell]
+                ids.discard(alert_id)
+                if not ids:
+                    del self.grid[cell]
+        for ugc in (alert.get("geocode") or {}).get("UGC") or []:
+            ids = self.zones.get(ugc)
+            if ids is not None:
+                ids.discard(alert_id)
+                if not ids:
+                    del self.zones[ugc]
+
+    def update(self, alerts: Sequence[dict]) -> None:
+        """Replace the indexed set, only touching alerts that came or went."""
+        current = {alert["id"]: alert for alert in alerts if alert.get("id")}
+        removed = self.alerts.keys() - current.keys()
+        added = current.keys() - self.alerts.keys()
+        for alert_id in removed:
+            self._remove(alert_id)
+        for alert_id in added:
+            self._add(alert_id, current[alert_id])
+        self.touch()
+        _log.debug(
+            f"Alert index: {len(added)} added, {len(removed)} removed, "
+            f"{len(self.alerts)} total"
+        )
+
+    def touch(self) -> None:
+        """Mark the index as up to date with upstream."""
+        self.updated = time.monotonic()
+
+    def is_fresh(self, max_age: float) -> bool:
+        return self.updated is not None and time.monotonic() - self.updated < max_age
+
+    def query(
+        self, point: Tuple[float, float], zones: Iterable[str] = ()
+    ) -> List[dict]:
+        """Alerts whose polygon contains `point` (lat, lon) or that cover `zones`."""
+        lat, lon = point
+        cell = math.floor(lon / CELL_SIZE), math.floor(lat / CELL_SIZE)
+        found = set()
+        for alert_id in self.grid.get(cell, ()):
+            for bbox, polygon in self.shapes[alert_id]:
+                min_x, min_y, max_x, max_y = bbox
+                if (
+                    min_x <= lon <= max_x
+                    and min_y <= lat <= max_y
+                    and contains(polygon, lon, lat)
+                ):
+                    found.add(alert_id)
+                    break
+        for zone in zones:
+            found.update(self.zones.get(zone, ()))
+        return sorted(
+            (self.alerts[alert_id] for alert_id in found),
+            key=lambda alert: alert.get("sent") or "",
+            reverse=True,
+        )
+
+    def clear(self) -> None:
+        self.alerts.clear()
+        self.shapes.clear()
+        self.grid.clear()
+        self.zones.clear()
+        self.updated = None
+
+    def __len__(self) -> int:
+        return len(self.alerts)
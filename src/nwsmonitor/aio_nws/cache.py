@@ -0,0 +1,123 @@
+"""HTTP validator cache used by aio_nws.fetch for conditional requests."""
+
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Hashable, Mapping, Optional, Tuple
+
+_log = logging.getLogger(__name__)
+
+
+class CacheEntry:
+    __slots__ = ("data", "digest", "etag", "last_modified", "expires")
+
+    def __init__(
+        self,
+        data: Any,
+        digest: bytes,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        expires: Optional[float] = None,
+    ) -> None:
+        self.data = data
+        self.digest = digest
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires = expires
+
+    def is_fresh(self) -> bool:
+        return self.expires is not None and time.time() < self.expires
+
+    def validators(self) -> Dict[str, str]:
+        """Headers that turn the next request into a conditional one."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def update(self, headers: Mapping[str, str]) -> None:
+        self.etag = headers.get("ETag", self.etag)
+        self.last_modified = headers.get("Last-Modified", self.last_modified)
+        self.expires = _expiry(headers)
+
+
+def _expiry(headers: Mapping[str, str]) -> Optional[float]:
+    """Absolute expiry time (epoch seconds) from Cache-Control or Expires."""
+    cache_control = headers.get("Cache-Control", "")
+    for directive in cache_control.split(","):
+        directive = directive.strip().lower()
+        if directive in {"no-cache", "no-store"}:
+            return None
+        if directive.startswith("max-age="):
+            try:
+                return time.time() + int(directive.removeprefix("max-age="))
+            except ValueError:
+                return None
+    expires = headers.get("Expires")
+    if expires:
+        try:
+            return parsedate_to_datetime(expires).timestamp()
+        except (TypeError, ValueError):
+            return None
+    return None
+
+
+def hasher(body: bytes = b"") -> Any:
+    return hashlib.blake2b(body, digest_size=16)
+
+
+def digest(body: bytes) -> bytes:
+    return hasher(body).digest()
+
+
+class ResponseCache:
+    """
+    Bounded LRU of decoded responses keyed on URL, parameters and Accept
+    header, along with the validators needed to revalidate them.
+    """
+
+    def __init__(self, max_entries: int = 64) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[Hashable, CacheEntry] = OrderedDict()
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(
+        base_url: Any, api_call: Any, accept: Optional[str], params: Dict[str, Any]
+    ) -> Tuple:
+        return (
+            str(base_url),
+            str(api_call),
+            accept,
+            tuple(sorted((k, repr(v)) for k, v in params.items())),
+        )
+
+    def get(self, key: Hashable) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def store(
+        self, key: Hashable, headers: Mapping[str, str], data: Any, body_digest: bytes
+    ) -> CacheEntry:
+        entry = CacheEntry(data, body_digest)
+        entry.update(headers)
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def clear(self) -> None:
+        self._entries.clear()
+        _log.debug("Cleared response cache")
+
+    def __len__(self) -> int:
+        return len(self._entries)
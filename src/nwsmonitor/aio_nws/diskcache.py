@@ -0,0 +1,93 @@
+"""Small persistent key-value caches backed by SQLite."""
+
+import json
+import time
+import sqlite3
+import logging
+from typing import Any, Dict, Optional
+
+db_file = "cache.sqlite3"
+_log = logging.getLogger(__name__)
+
+
+class PersistentLRU:
+    """
+    A size-bounded LRU cache with a per-entry TTL, stored in a table of
+    `db_file` so that it survives restarts. Values must be JSON-serializable.
+
+    Reads never write to the database: access times are kept in memory and
+    written with the next `set`, which is also when expired entries go.
+    """
+
+    def __init__(self, table: str, max_entries: int, ttl: float) -> None:
+        self.table = table
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._accessed: Dict[str, float] = {}
+        self._db: Optional[sqlite3.Connection] = None
+        self._path: Optional[str] = None
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None or self._path != db_file:
+            self._path = db_file
+            self._db = sqlite3.connect(db_file)
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "key TEXT PRIMARY KEY, value TEXT, expires REAL, accessed REAL)"
+            )
+            self._db.commit()
+        return self._db
+
+    def get(self, key: str) -> Optional[Any]:
+        row = self.db.execute(
+            f"SELECT value, expires FROM {self.table} WHERE key = ?", (key,)
+        ).fetchone()
+        now = time.time()
+        if row is None or row[1] < now:
+            self.misses += 1
+            return None
+        self._accessed[key] = now
+        self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        now = time.time()
+        expires = now + (self.ttl if ttl is None else ttl)
+        db = self.db
+        self._accessed.pop(key, None)
+        if self._accessed:
+            db.executemany(
+                f"UPDATE {self.table} SET accessed = ? WHERE key = ?",
+                [(accessed, k) for k, accessed in self._accessed.items()],
+            )
+            self._accessed.clear()
+        db.execute(
+            f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value), expires, now),
+        )
+        db.execute(f"DELETE FROM {self.table} WHERE expires < ?", (now,))
+        (count,) = db.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+        if count > self.max_entries:
+            db.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f"SELECT key FROM {self.table} ORDER BY accessed LIMIT ?)",
+                (count - self.max_entries,),
+            )
+        db.commit()
+
+    def delete(self, key: str) -> None:
+        self._accessed.pop(key, None)
+        self.db.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+        self.db.commit()
+
+    def clear(self) -> None:
+        self._accessed.clear()
+        self.db.execute(f"DELETE FROM {self.table}")
+        self.db.commit()
+        _log.debug(f"Cleared {self.table}")
+
+    def __len__(self) -> int:
+        return self.db.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
@@ -0,0 +1,277 @@
+"""
+Offline lookup of US places, counties and ZIP codes.
+
+The data file is built from the Census Bureau's Gazetteer files
+(https://www.census.gov/geographies/reference-files/time-series/geo/gazetteer-files.html):
+
+    python -m nwsmonitor.aio_nws.gazetteer --places 2023_Gaz_place_national.txt \\
+        --counties 2023_Gaz_counties_national.txt --zctas 2023_Gaz_zcta_national.txt
+
+If the data file is missing, every lookup misses and geocoding falls back to
+Nominatim.
+"""
+
+import re
+import csv
+import gzip
+import math
+import bisect
+import difflib
+import logging
+import argparse
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+from addfips import AddFIPS
+
+DATA_FILE = Path(__file__).with_name("gazetteer.tsv.gz")
+FUZZY_CUTOFF = 0.85
+GRID_SIZE = 1.0  # degrees
+_log = logging.getLogger(__name__)
+_fips = AddFIPS()
+# A bare ZIP, "ST 12345" or "City, ST 12345". Anything more specific, like a
+# street address, would lose precision if answered with the ZIP's centroid.
+_ZIP = re.compile(
+    r"^(?:[^\d,]+,\s*)?(?:[a-z]{2}\s+)?(\d{5})(?:-\d{4})?$", re.IGNORECASE
+)
+_COORDINATES = re.compile(r"^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$")
+_COUNTRY = re.compile(r"[,\s]+(?:usa|us|united states)$", re.IGNORECASE)
+_PUNCTUATION = re.compile(r"[.'`]")
+# Census place names end with their legal/statistical area description.
+_PLACE_SUFFIX = re.compile(
+    r"\s+(?:\(balance\)\s*)?(?:city and borough|consolidated government|"
+    r"metropolitan government|unified government|urban county|city|town|"
+    r"village|borough|municipality|cdp|comunidad|zona urbana)"
+    r"(?:\s+\(balance\))?$",
+    re.IGNORECASE,
+)
+
+
+@dataclass(frozen=True)
+class Place:
+    kind: str  # "place", "county", "zip" or "point" (near a place)
+    geoid: str
+    name: str
+    state: str  # postal abbreviation, empty for ZIP codes
+    latitude: float
+    longitude: float
+
+    @property
+    def label(self) -> str:
+        if self.kind == "zip":
+            return self.name
+        if self.kind == "point":
+            return f"{self.latitude}, {self.longitude} (near {self.name}, {self.state})"
+        return f"{self.name}, {self.state}"
+
+    @property
+    def state_fips(self) -> str:
+        return self.geoid[:2]
+
+
+def _key(name: str) -> str:
+    name = _PUNCTUATION.sub("", name.lower())
+    name = re.sub(r"^saint\s", "st ", name)
+    return " ".join(name.replace("-", " ").split())
+
+
+class Gazetteer:
+    def __init__(self, places: List[Place]) -> None:
+        self.zips: Dict[str, Place] = {}
+        # (state FIPS, key) -> places; places come first, then counties
+        self.names: Dict[Tuple[str, str], List[Place]] = defaultdict(list)
+        self.keys_by_state: Dict[str, List[str]] = defaultdict(list)
+        self.grid: Dict[Tuple[int, int], List[Place]] = defaultdict(list)
+        for place in places:
+            if place.kind == "zip":
+                self.zips[place.name] = place
+                continue
+            key = _key(place.name)
+            matches = self.names[place.state_fips, key]
+            if not matches:
+                self.keys_by_state[place.state_fips].append(key)
+            matches.append(place)
+            if place.kind == "place":
+                self.grid[self._cell(place.latitude, place.longitude)].append(place)
+        for keys in self.keys_by_state.values():
+            keys.sort()
+
+    def __len__(self) -> int:
+        return len(self.zips) + sum(len(v) for v in self.names.values())
+
+    @staticmethod
+    def _cell(latitude: float, longitude: float) -> Tuple[int, int]:
+        return math.floor(latitude / GRID_SIZE), math.floor(longitude / GRID_SIZE)
+
+    def search(self, state_fips: str, prefix: str, limit: int = 10) -> List[Place]:
+        """Places in a state whose name starts with `prefix`."""
+        prefix = _key(prefix)
+        keys = self.keys_by_state.get(state_fips, [])
+        results = []
+        for i in range(bisect.bisect_left(keys, prefix), len(keys)):
+            if not keys[i].startswith(prefix) or len(results) >= limit:
+                break
+            results.extend(self.names[state_fips, keys[i]])
+        return results[:limit]
+
+    def find(self, name: str, state: str) -> Optional[Place]:
+        """
+        Find a place or county by name within a state (name or postal code).
+        Tries an exact match, then a unique prefix match, then a fuzzy match.
+        """
+        state_fips = _fips.get_state_fips(state)
+        if state_fips is None:
+            return None
+        key = _key(name)
+        matches = self.names.get((state_fips, key))
+        if matches:
+            return matches[0]
+        prefixed = self.search(state_fips, key, limit=2)
+        if len(prefixed) == 1:
+            return prefixed[0]
+        close = difflib.get_close_matches(
+            key, self.keys_by_state.get(state_fips, []), n=1, cutoff=FUZZY_CUTOFF
+        )
+        if close:
+            return self.names[state_fips, close[0]][0]
+        return None
+
+    def nearest(self, latitude: float, longitude: float) -> Optional[Place]:
+        """The closest place to the given point, searching outward by cell."""
+        row, col = self._cell(latitude, longitude)
+        scale = math.cos(math.radians(latitude))
+        best, best_distance = None, math.inf
+        for radius in range(4):
+            for i in range(row - radius, row + radius + 1):
+                for j in range(col - radius, col + radius + 1):
+                    if max(abs(i - row), abs(j - col)) != radius:
+                        continue
+                    for place in self.grid.get((i, j), ()):
+                        distance = (place.latitude - latitude) ** 2 + (
+                            (place.longitude - longitude) * scale
+                        ) ** 2
+                        if distance < best_distance:
+                            best, best_distance = place, distance
+            if best is not None:
+                # Anything in the next ring is at least `radius` cells away.
+                if math.sqrt(best_distance) <= radius * GRID_SIZE * scale:
+                    break
+        return best
+
+    def lookup(self, query: str) -> Optional[Place]:
+        """
+        Resolve "City, ST", "County Name, State", a ZIP code or a
+        "lat, lon" pair. Returns None if the query can't be served offline.
+        """
+        coordinates = _COORDINATES.match(query)
+        if coordinates:
+            latitude, longitude = (float(v) for v in coordinates.groups())
+            place = self.nearest(latitude, longitude)
+            if place is None:
+                return None
+            return Place(
+                "point", place.geoid, place.name, place.state, latitude, longitude
+            )
+        query = _COUNTRY.sub("", query.strip())
+        zip_code = _ZIP.match(query)
+        if zip_code:
+            return self.zips.get(zip_code.group(1))
+        if any(c.isdigit() for c in query):
+            return None  # probably a street address
+        if "," in query:
+            name, state = query.rsplit(",", 1)
+            return self.find(name, state.strip())
+        words = query.split()
+        # Try one- and two-word state names, e.g. "Raleigh North Carolina".
+        for n in (1, 2):
+            if len(words) > n:
+                place = self.find(" ".join(words[:-n]), " ".join(words[-n:]))
+                if place is not None:
+                    return place
+        return None
+
+
+def _read(path: Path) -> Iterator[Place]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for kind, geoid, name, state, latitude, longitude in csv.reader(
+            f, delimiter="\t"
+        ):
+            yield Place(kind, geoid, name, state, float(latitude), float(longitude))
+
+
+_gazetteer: Optional[Gazetteer] = None
+
+
+def load(path: Optional[Path] = None) -> Gazetteer:
+    """Load the data file (or an empty gazetteer if there is none)."""
+    global _gazetteer
+    path = Path(path or DATA_FILE)
+    try:
+        _gazetteer = Gazetteer(list(_read(path)))
+        _log.info(f"Loaded {len(_gazetteer)} gazetteer entries from {path}")
+    except FileNotFoundError:
+        _log.info(f"No gazetteer at {path}. Geocoding will use Nominatim only.")
+        _gazetteer = Gazetteer([])
+    return _gazetteer
+
+
+def get() -> Gazetteer:
+    if _gazetteer is None:
+        return load()
+    return _gazetteer
+
+
+def _census_rows(path: Path) -> Iterator[Dict[str, str]]:
+    with open(path, encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f, delimiter="\t")
+        reader.fieldnames = [name.strip() for name in reader.fieldnames]
+        yield from reader
+
+
+def build(places: Path, counties: Path, zctas: Path, output: Path) -> int:
+    """Build the data file from Census Gazetteer files. Returns the row count."""
+    rows = []
+    place_rows = sorted(
+        _census_rows(places),
+        # Incorporated places before CDPs of the same name.
+        key=lambda row: row.get("FUNCSTAT", "") != "A",
+    )
+    for row in place_rows:
+        name = _PLACE_SUFFIX.sub("", row["NAME"])
+        rows.append(("place", row["GEOID"], name, row["USPS"], row))
+    for row in _census_rows(counties):
+        rows.append(("county", row["GEOID"], row["NAME"], row["USPS"], row))
+    for row in _census_rows(zctas):
+        rows.append(("zip", row["GEOID"], row["GEOID"], "", row))
+    with gzip.open(output, "wt", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, delimiter="\t", lineterminator="\n")
+        for kind, geoid, name, state, row in rows:
+            writer.writerow(
+                (
+                    kind,
+                    geoid,
+                    name,
+                    state,
+                    round(float(row["INTPTLAT"]), 4),
+                    round(float(row["INTPTLONG"]), 4),
+                )
+            )
+    return len(rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Build the offline gazetteer from Census Gazetteer files."
+    )
+    parser.add_argument("--places", type=Path, required=True)
+    parser.add_argument("--counties", type=Path, required=True)
+    parser.add_argument("--zctas", type=Path, required=True)
+    parser.add_argument("-o", "--output", type=Path, default=DATA_FILE)
+    args = parser.parse_args()
+    count = build(args.places, args.counties, args.zctas, args.output)
+    print(f"Wrote {count} entries to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
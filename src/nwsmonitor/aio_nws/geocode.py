@@ -0,0 +1,194 @@
+"""Non-blocking geocoding through Nominatim."""
+
+import re
+import time
+import asyncio
+import datetime
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+from geopy import Nominatim, Location
+from geopy.adapters import AioHTTPAdapter
+from . import ratelimit
+from . import gazetteer
+from .diskcache import PersistentLRU
+from .singleflight import SingleFlight
+
+NOMINATIM_HOST = "nominatim.openstreetmap.org"
+GEOCODE_TIMEOUT = 20  # seconds
+MEMORY_CACHE_SIZE = 256
+CACHE_TTL = datetime.timedelta(days=30).total_seconds()
+# "Could not geolocate" results are remembered for less time.
+NEGATIVE_CACHE_TTL = datetime.timedelta(days=1).total_seconds()
+_log = logging.getLogger(__name__)
+_geolocator: Optional[Nominatim] = None
+# normalized query -> (expires, {"address", "latitude", "longitude", "raw"}),
+# where an empty dict is a cached miss.
+_memory_cache: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+disk_cache = PersistentLRU("geocode", max_entries=10000, ttl=CACHE_TTL)
+in_flight = SingleFlight()
+_ZIP4 = re.compile(r"\b(\d{5})-\d{4}\b")
+# Signed decimal numbers keep their sign and point, so that coordinates like
+# "45.52, -122.68" and "45.52, 122.68" stay distinct; other punctuation is
+# dropped.
+_TOKEN = re.compile(r"(?<!\w)-?\d+(?:\.\d+)?|\w+")
+
+# Nominatim's usage policy allows at most one request per second.
+ratelimit.HOST_LIMITS.setdefault(NOMINATIM_HOST, (1.0, 1, 1))
+
+
+@dataclass
+class GeocodeStats:
+    requests: int = 0
+    gazetteer_hits: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    timeouts: int = 0
+    errors: int = 0
+    total_time: float = 0.0
+    max_time: float = 0.0
+
+    @property
+    def mean_time(self) -> float:
+        return self.total_time / self.requests if self.requests else 0.0
+
+    def record(self, elapsed: float) -> None:
+        self.requests += 1
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+
+
+stats = GeocodeStats()
+
+
+def get_geolocator(user_agent: str) -> Nominatim:
+    global _geolocator
+    if _geolocator is None or _geolocator.headers.get("User-Agent") != user_agent:
+        _geolocator = Nominatim(
+            user_agent=user_agent,
+            adapter_factory=AioHTTPAdapter,
+            timeout=GEOCODE_TIMEOUT,
+        )
+    return _geolocator
+
+
+def normalize(query: str) -> str:
+    """
+    Reduce an address to a cache key, e.g. "Norman,  OK 73069-1234" and
+    "norman ok 73069" are the same.
+    """
+    query = _ZIP4.sub(r"\1", query.lower())
+    return " ".join(_TOKEN.findall(query))
+
+
+def _to_location(value: dict) -> Optional[Location]:
+    if not value:
+        return None
+    return Location(
+        value["address"], (value["latitude"], value["longitude"]), value["raw"]
+    )
+
+
+def _from_location(location: Optional[Location]) -> dict:
+    if location is None:
+        return {}
+    return {
+        "address": location.address,
+        "latitude": location.latitude,
+        "longitude": location.longitude,
+        "raw": location.raw,
+    }
+
+
+def _cache_get(key: str) -> Optional[dict]:
+    entry = _memory_cache.get(key)
+    if entry is not None:
+        if entry[0] > time.time():
+            _memory_cache.move_to_end(key)
+            return entry[1]
+        del _memory_cache[key]
+    value = disk_cache.get(key)
+    if value is not None:
+        # Re-read from disk at least daily so on-disk expiry still applies.
+        _memory_put(key, value, time.time() + NEGATIVE_CACHE_TTL)
+    return value
+
+
+def _memory_put(key: str, value: dict, expires: float) -> None:
+    _memory_cache[key] = (expires, value)
+    _memory_cache.move_to_end(key)
+    while len(_memory_cache) > MEMORY_CACHE_SIZE:
+        _memory_cache.popitem(last=False)
+
+
+def _cache_set(key: str, value: dict) -> None:
+    ttl = CACHE_TTL if value else NEGATIVE_CACHE_TTL
+    _memory_put(key, value, time.time() + ttl)
+    disk_cache.set(key, value, ttl)
+
+
+def clear_cache() -> None:
+    _memory_cache.clear()
+    disk_cache.clear()
+
+
+async def geocode(query: str, user_agent: str) -> Optional[Location]:
+    """
+    Geocode `query` within the US without blocking the event loop, using the
+    offline gazetteer or the cache where possible. Returns None if the place
+    could not be found. Raises asyncio.TimeoutError if Nominatim takes longer
+    than GEOCODE_TIMEOUT.
+    """
+    place = gazetteer.get().lookup(query)
+    if place is not None:
+        stats.gazetteer_hits += 1
+        return Location(
+            place.label,
+            (place.latitude, place.longitude),
+            {"source": "gazetteer", "kind": place.kind, "geoid": place.geoid},
+        )
+    key = normalize(query)
+    value = _cache_get(key)
+    if value is not None:
+        stats.cache_hits += 1
+        return _to_location(value)
+    stats.cache_misses += 1
+
+    async def lookup() -> dict:
+        value = _from_location(await _geocode(query, user_agent))
+        _cache_set(key, value)
+        return value
+
+    return _to_location(await in_flight.do(key, lookup))
+
+
+async def _geocode(query: str, user_agent: str) -> Optional[Location]:
+    geolocator = get_geolocator(user_agent)
+
+    async def request() -> Optional[Location]:
+        async with ratelimit.slot(NOMINATIM_HOST):
+            return await geolocator.geocode(query, country_codes="us")
+
+    start = time.monotonic()
+    try:
+        # One deadline for waiting our turn and for the request itself.
+        return await asyncio.wait_for(request(), GEOCODE_TIMEOUT)
+    except asyncio.TimeoutError:
+        stats.timeouts += 1
+        raise
+    except Exception:
+        stats.errors += 1
+        raise
+    finally:
+        elapsed = time.monotonic() - start
+        stats.record(elapsed)
+        _log.debug(f"Geocoded {query!r} in {elapsed:.2f} seconds")
+
+
+async def close() -> None:
+    """Close the geocoder's HTTP session. It is reopened on next use."""
+    global _geolocator
+    geolocator, _geolocator = _geolocator, None
+    if geolocator is not None:
+        await geolocator.__aexit__(None, None, None)
@@ -1,21 +1,51 @@
 import aiohttp
 import aiofiles
 import pandas as pd
+import os
 import json
+import asyncio
 import datetime
 import logging
 from dataclasses import dataclass
 from html.parser import HTMLParser
-from geopy import Nominatim, Location
-from typing import Optional, NamedTuple, Any, Union, Literal, List, Tuple
+from geopy import Location
+from typing import Optional, NamedTuple, Any, Union, Literal, List, Tuple, Sequence
+from . import session as _session
+from .session import get_session
+from . import geocode
+from .cache import ResponseCache, digest, hasher
+from .diskcache import PersistentLRU
+from .stream import ALERT_FIELDS, iter_graph
+from .alert_index import INDEX_FIELDS, AlertIndex
+from . import resilience
+from .resilience import HTTPStatusError, CircuitOpenError
+from .singleflight import SingleFlight
+from .ratelimit import Priority, priority
 
 USER_AGENT = "(NWSMonitor/debug, nategreenwell@live.com)"
-BASE_URL_IEM = "https://mesonet.agron.iastate.edu"
+# The base URLs can be overridden, e.g. to point at nwsmonitor.fake_server.
+BASE_URL_IEM = os.environ.get(
+    "NWSMONITOR_BASE_URL_IEM", "https://mesonet.agron.iastate.edu"
+)
 BASE_API_PATH_IEM = "/api/1"
 AUTOPLOT_PATH_IEM = "/plotting/auto"
-BASE_URL_NWS = "https://api.weather.gov"
+BASE_URL_NWS = os.environ.get("NWSMONITOR_BASE_URL_NWS", "https://api.weather.gov")
+BASE_URL_WEATHER_IM = os.environ.get(
+    "NWSMONITOR_BASE_URL_WEATHER_IM", "https://weather.im"
+)
 NWS_DATA_FORMAT = "application/ld+json"
 _log = logging.getLogger(__name__)
+response_cache = ResponseCache()
+# Gridpoint metadata and nearest stations by rounded lat/lon.
+GRIDPOINT_CACHE_PRECISION = 3  # decimal places, about 100 m
+GRIDPOINT_CACHE_STATIONS = 5
+gridpoint_cache = PersistentLRU(
+    "gridpoints", max_entries=5000, ttl=datetime.timedelta(days=30).total_seconds()
+)
+in_flight = SingleFlight()
+# Every active alert, as of the last unfiltered poll.
+alert_index = AlertIndex()
+ALERT_INDEX_MAX_AGE = 180  # seconds
 
 
 @dataclass
@@ -89,41 +119,145 @@ class AutoplotParser(HTMLParser):
         return self._img_url
 
 
+def set_base_urls(
+    nws: Optional[str] = None,
+    iem: Optional[str] = None,
+    weather_im: Optional[str] = None,
+) -> None:
+    """Point the client at different upstream hosts."""
+    global BASE_URL_NWS, BASE_URL_IEM, BASE_URL_WEATHER_IM
+    if nws:
+        BASE_URL_NWS = nws
+    if iem:
+        BASE_URL_IEM = iem
+    if weather_im:
+        BASE_URL_WEATHER_IM = weather_im
+
+
+async def close_sessions() -> None:
+    """Close every shared HTTP session, including the geocoder's."""
+    await _session.close_sessions()
+    await geocode.close()
+
+
+def open_sessions() -> None:
+    """Open the shared sessions for every upstream host."""
+    _session.open_sessions(BASE_URL_NWS, BASE_URL_IEM, BASE_URL_WEATHER_IM)
+
+
 async def check_status(response: aiohttp.ClientResponse) -> None:
-    if response.status not in {200, 301}:
+    if response.status not in {200, 301, 304}:
         try:
             details = await response.json()
         except aiohttp.ClientResponseError:
             details = await response.text()
         headers = response.headers
-        raise RuntimeError(f"Status {response.status}. {details=}; {headers=}")
+        raise HTTPStatusError(
+            f"Status {response.status}. {details=}; {headers=}",
+            response.status,
+            headers,
+        )
 
 
-async def fetch(
+class FetchResult(NamedTuple):
+    data: Any
+    changed: bool
+
+
+async def fetch_conditional(
     client: aiohttp.ClientSession,
     api_call: str,
     accept: Optional[str] = None,
     no_cache: bool = False,
+    use_cache: bool = True,
+    graph_fields: Optional[Sequence[str]] = None,
+    hedge: bool = False,
     **kwargs,
-) -> Any:
+) -> FetchResult:
+    """
+    Like `fetch`, but revalidate against the response cache and report
+    whether the payload changed since the last request for the same URL,
+    parameters and Accept header.
+
+    If `graph_fields` is given, the response is a JSON-LD document whose
+    "@graph" array is parsed incrementally, keeping only those fields.
+    If `hedge` is True, a duplicate request is sent when the first one is
+    slow (see `resilience.policy.hedge_delay`).
+    """
     headers = {"User-Agent": USER_AGENT}
     if accept:
         headers["Accept"] = accept
     if no_cache:
         headers["Cache-Control"] = "no-cache"
-    _log.debug(f"Fetching {client._base_url}{api_call} with {headers=} and {kwargs=}")
-    async with client.get(
-        api_call,
-        params=kwargs,
-        headers=headers,
-        raise_for_status=check_status,
-        timeout=aiohttp.ClientTimeout(total=60),
-    ) as resp:
-        _log.debug(f"Response headers: {resp.headers}")
-        try:
-            return await resp.json()
-        except aiohttp.ClientResponseError:
-            return await resp.text()
+    key = response_cache.key(client._base_url, api_call, accept, kwargs)
+    entry = response_cache.get(key) if use_cache else None
+    if entry is not None:
+        if entry.is_fresh() and not no_cache:
+            response_cache.hits += 1
+            return FetchResult(entry.data, False)
+        headers.update(entry.validators())
+
+    async def request() -> FetchResult:
+        _log.debug(
+            f"Fetching {client._base_url}{api_call} with {headers=} and {kwargs=}"
+        )
+        async with client.get(
+            api_call,
+            params=kwargs,
+            headers=headers,
+            raise_for_status=check_status,
+            timeout=aiohttp.ClientTimeout(total=60),
+        ) as resp:
+            _log.debug(f"Response headers: {resp.headers}")
+            if resp.status == 304 and entry is not None:
+                response_cache.revalidations += 1
+                entry.update(resp.headers)
+                return FetchResult(entry.data, False)
+            if graph_fields is not None:
+                body_hasher = hasher()
+                data = {
+                    "@graph": [
+                        record
+                        async for record in iter_graph(
+                            resp.content, graph_fields, body_hasher
+                        )
+                    ]
+                }
+                body_digest = body_hasher.digest()
+            else:
+                data = None
+                body_digest = digest(await resp.read())
+            if entry is not None and entry.digest == body_digest:
+                # Server ignored our validators but the body is identical.
+                response_cache.revalidations += 1
+                entry.update(resp.headers)
+                return FetchResult(entry.data, False)
+            response_cache.misses += 1
+            if data is None:
+                try:
+                    data = await resp.json()
+                except aiohttp.ClientResponseError:
+                    data = await resp.text()
+            if use_cache:
+                response_cache.store(key, resp.headers, data, body_digest)
+            return FetchResult(data, True)
+
+    fields_key = None if graph_fields is None else tuple(graph_fields)
+    flight_key = (key, no_cache, use_cache, fields_key)
+    return await in_flight.do(
+        flight_key, lambda: resilience.call(client._base_url.host, request, hedge)
+    )
+
+
+async def fetch(
+    client: aiohttp.ClientSession,
+    api_call: str,
+    accept: Optional[str] = None,
+    no_cache: bool = False,
+    **kwargs,
+) -> Any:
+    result = await fetch_conditional(client, api_call, accept, no_cache, **kwargs)
+    return result.data
 
 
 async def fetch_autoplot(
@@ -151,13 +285,14 @@ async def fetch_autoplot(
     if date:
         kwargs["valid"] = date.strftime("%Y/%m/%d %H%M")
 
-    async with aiohttp.ClientSession(
-        base_url=BASE_URL_IEM, raise_for_status=True, requote_redirect_url=False
-    ) as session:
-        parser = AutoplotParser()
-        # IEM is really picky with encoding so I need this to be able
-        # to bypass YARL's fuckery
-        params = urlencode(kwargs)
+    session = get_session(BASE_URL_IEM)
+    host = session._base_url.host
+    parser = AutoplotParser()
+    # IEM is really picky with encoding so I need this to be able
+    # to bypass YARL's fuckery
+    params = urlencode(kwargs)
+
+    async def request_page() -> None:
         async with session.get(
             URL(f"{AUTOPLOT_PATH_IEM}/?{params}", encoded=True),
             headers=headers,
@@ -175,18 +310,25 @@ async def fetch_autoplot(
                     "Autoplot request succeeded but the image was not found."
                 )
 
+    async def request_image() -> None:
         async with session.get(
             parser.img_url,
+            headers=headers,
             raise_for_status=check_status,
             timeout=aiohttp.ClientTimeout(total=60),
         ) as resp:
             async with aiofiles.open("autoplot.png", "wb") as img:
                 await img.write(await resp.read())
 
+    await resilience.call(host, request_page)
+    await resilience.call(host, request_image)
+
 
-def locate(address: str) -> Tuple[Point, Location]:
-    geolocator = Nominatim(user_agent=USER_AGENT)
-    location = geolocator.geocode(address, country_codes="us", timeout=20)
+async def locate(address: str) -> Tuple[Point, Location]:
+    try:
+        location = await geocode.geocode(address, USER_AGENT)
+    except asyncio.TimeoutError:
+        raise RuntimeError(f"Timed out while geolocating {address}.") from None
     if location is None:
         raise RuntimeError(f"Could not geolocate {address} within the US.")
     return Point(location.latitude, location.longitude), location
@@ -210,39 +352,33 @@ async def afos(
     if date:
         params["date"] = date.isoformat()
 
-    async with aiohttp.ClientSession(
-        base_url=BASE_URL_IEM, raise_for_status=True
-    ) as session:
-        data = await fetch(session, f"{BASE_API_PATH_IEM}/nws/afos/list.json", **params)
-        if not isinstance(data, dict):
-            raise RuntimeError(f"Expected a dict, got {type(data).__name__}.")
-        return pd.DataFrame(data["data"])
+    session = get_session(BASE_URL_IEM)
+    data = await fetch(session, f"{BASE_API_PATH_IEM}/nws/afos/list.json", **params)
+    if not isinstance(data, dict):
+        raise RuntimeError(f"Expected a dict, got {type(data).__name__}.")
+    return pd.DataFrame(data["data"])
 
 
 async def nwstext(pid: str) -> str:
-    async with aiohttp.ClientSession(
-        base_url=BASE_URL_IEM, raise_for_status=True
-    ) as session:
-        data = await fetch(session, f"{BASE_API_PATH_IEM}/nwstext/{pid}")
-        return data
+    session = get_session(BASE_URL_IEM)
+    data = await fetch(session, f"{BASE_API_PATH_IEM}/nwstext/{pid}")
+    return data
 
 
 async def active_alerts_count() -> ActiveAlertsCount:
-    async with aiohttp.ClientSession(
-        base_url=BASE_URL_NWS, raise_for_status=check_status
-    ) as session:
-        data = await fetch(session, f"/alerts/active/count")
-        return ActiveAlertsCount(
-            data["total"],
-            data["land"],
-            data["marine"],
-            data["regions"],
-            data["areas"],
-            data["zones"],
-        )
+    session = get_session(BASE_URL_NWS)
+    data = await fetch(session, f"/alerts/active/count")
+    return ActiveAlertsCount(
+        data["total"],
+        data["land"],
+        data["marine"],
+        data["regions"],
+        data["areas"],
+        data["zones"],
+    )
 
 
-async def alerts(
+def _alert_query(
     *,
     active: bool = True,
     start: Optional[datetime.datetime] = None,
@@ -269,7 +405,7 @@ async def alerts(
     ] = None,
     cursor: Optional[str] = None,
     **kwargs,
-) -> pd.DataFrame:
+) -> Tuple[str, dict]:
     params = {}
     if active:
         api_call = "/alerts/active"
@@ -310,76 +446,191 @@ async def alerts(
         params["certainty"] = certainty
     if cursor:
         params["cursor"] = cursor
+    return api_call, params
 
-    async with aiohttp.ClientSession(
-        base_url=BASE_URL_NWS, raise_for_status=check_status
-    ) as session:
-        data = await fetch(session, api_call, NWS_DATA_FORMAT, **params)
-        return pd.DataFrame(data["@graph"])
+
+async def alerts(**kwargs) -> pd.DataFrame:
+    """Query alerts. Accepts the same filters as `_alert_query`."""
+    return (await poll_alerts(**kwargs))[0]
+
+
+async def poll_alerts(
+    hedge: bool = False, use_cache: bool = True, **kwargs
+) -> Tuple[pd.DataFrame, bool]:
+    """
+    Like `alerts`, but also report whether the result changed since the
+    previous poll with the same filters. Pass `use_cache=False` for queries
+    that are never repeated, which then always count as changed.
+
+    The response is streamed, and only the fields in ALERT_FIELDS are kept.
+    Polling every active alert also updates `alert_index`.
+    """
+    api_call, params = _alert_query(**kwargs)
+    indexed = api_call == "/alerts/active" and not params
+    session = get_session(BASE_URL_NWS)
+    result = await fetch_conditional(
+        session,
+        api_call,
+        NWS_DATA_FORMAT,
+        graph_fields=ALERT_FIELDS + INDEX_FIELDS if indexed else ALERT_FIELDS,
+        hedge=hedge,
+        use_cache=use_cache,
+        **params,
+    )
+    graph = result.data["@graph"]
+    if indexed:
+        if result.changed or not alert_index.updated:
+            alert_index.update(graph)
+        else:
+            alert_index.touch()
+    return pd.DataFrame(graph, columns=ALERT_FIELDS), result.changed
+
+
+async def alert_by_id(alert_id: str) -> Optional[pd.DataFrame]:
+    """A single alert, or None if the API doesn't have it (any more)."""
+    session = get_session(BASE_URL_NWS)
+    try:
+        data = await fetch(session, f"/alerts/{alert_id}", NWS_DATA_FORMAT)
+    except HTTPStatusError as e:
+        if e.status in {400, 404}:
+            return None
+        raise
+    return pd.DataFrame([data], columns=ALERT_FIELDS)
 
 
 async def alerts_for_location(address: str, **kwargs) -> pd.DataFrame:
-    point = locate(address)[0]
+    """
+    Alerts for a place. Answered from `alert_index` when it is fresh and the
+    only filter is `status`, otherwise from the API.
+    """
+    point = (await locate(address))[0]
+    if set(kwargs) <= {"status"} and alert_index.is_fresh(ALERT_INDEX_MAX_AGE):
+        try:
+            meta = (await point_metadata(point))[1]
+        except Exception as e:
+            _log.warning(f"Could not get zones for {point}: {e!r}")
+        else:
+            zones = (meta["forecastZone"], meta["county"], meta["fireWeatherZone"])
+            status = kwargs.get("status")
+            if isinstance(status, str):
+                status = [status]
+            found = [
+                alert
+                for alert in alert_index.query(point, (z for z in zones if z))
+                if not status
+                or str(alert.get("status")).lower() in {s.lower() for s in status}
+            ]
+            alert_index.hits += 1
+            return pd.DataFrame(found, columns=ALERT_FIELDS)
+    alert_index.fallbacks += 1
     return await alerts(point=point, **kwargs)
 
 
 async def glossary() -> pd.DataFrame:
-    async with aiohttp.ClientSession(
-        base_url=BASE_URL_NWS, raise_for_status=check_status
-    ) as session:
-        data = await fetch(session, "/glossary")
-        return pd.DataFrame(data["glossary"])
+    session = get_session(BASE_URL_NWS)
+    data = await fetch(session, "/glossary")
+    return pd.DataFrame(data["glossary"])
 
 
-async def point_forecast(
-    point: Tuple[float, float], units: Optional[Literal["us", "si"]] = "us"
-) -> Tuple[Any, pd.DataFrame]:
-    async with aiohttp.ClientSession(
-        base_url=BASE_URL_NWS, raise_for_status=check_status
-    ) as session:
+def _zone_id(url: Optional[str]) -> Optional[str]:
+    return url.rsplit("/", 1)[-1] if url else None
+
+
+async def point_metadata(point: Tuple[float, float]) -> Tuple[str, dict]:
+    """
+    Resolve a point to its gridpoint and zones, using the persistent cache
+    when possible. Returns the cache key along with the metadata.
+    """
+    lat, lon = (round(v, GRIDPOINT_CACHE_PRECISION) for v in point)
+    key = f"{lat},{lon}"
+    meta = gridpoint_cache.get(key)
+    if meta is None:
+        session = get_session(BASE_URL_NWS)
         html_point = f"{point[0]},{point[1]}"
         data = await fetch(session, f"/points/{html_point}", NWS_DATA_FORMAT)
-        wfo = data["cwa"]
-        x = data["gridX"]
-        y = data["gridY"]
-        gridpoint = f"/gridpoints/{wfo}/{x},{y}"
+        meta = {
+            "cwa": data["cwa"],
+            "gridX": data["gridX"],
+            "gridY": data["gridY"],
+            "forecastZone": _zone_id(data.get("forecastZone")),
+            "county": _zone_id(data.get("county")),
+            "fireWeatherZone": _zone_id(data.get("fireWeatherZone")),
+            "stations": None,
+        }
+        gridpoint_cache.set(key, meta)
+    return key, meta
+
+
+async def point_forecast(
+    point: Tuple[float, float],
+    units: Optional[Literal["us", "si"]] = "us",
+    include_forecast: bool = True,
+    include_observation: bool = True,
+) -> Tuple[Any, Optional[pd.DataFrame]]:
+    """
+    Get the latest observation and the forecast for a point. The forecast
+    and the station lookup both only depend on /points, so they run
+    concurrently. Either half can be skipped, in which case it is None.
+    """
+    session = get_session(BASE_URL_NWS)
+    key, meta = await point_metadata(point)
+    gridpoint = f"/gridpoints/{meta['cwa']}/{meta['gridX']},{meta['gridY']}"
+
+    async def get_periods() -> Optional[pd.DataFrame]:
+        if not include_forecast:
+            return None
         forecast = await fetch(
             session, f"{gridpoint}/forecast", NWS_DATA_FORMAT, units=units
         )
-        stations = await fetch(session, f"{gridpoint}/stations", NWS_DATA_FORMAT)
-        stations = pd.DataFrame(stations["@graph"])
-        station = stations["stationIdentifier"][0]
-        obs = await fetch(
+        return pd.DataFrame(forecast["periods"])
+
+    async def get_observation() -> Any:
+        if not include_observation:
+            return None
+        if not meta.get("stations"):
+            stations = await fetch(session, f"{gridpoint}/stations", NWS_DATA_FORMAT)
+            meta["stations"] = [
+                s["stationIdentifier"]
+                for s in stations["@graph"][:GRIDPOINT_CACHE_STATIONS]
+            ]
+            gridpoint_cache.set(key, meta)
+        station = meta["stations"][0]
+        return await fetch(
             session,
             f"/stations/{station}/observations/latest",
             NWS_DATA_FORMAT,
             require_qc="false",
             no_cache=True,
         )
-        return obs, pd.DataFrame(forecast["periods"])
+
+    periods, obs = await asyncio.gather(get_periods(), get_observation())
+    return obs, periods
 
 
 async def get_forecast(
-    address: str, units: Optional[Literal["us", "si"]] = "us"
-) -> Tuple[Any, pd.DataFrame, Location]:
-    point, location = locate(address)
-    return await point_forecast(point, units) + (location,)
+    address: str,
+    units: Optional[Literal["us", "si"]] = "us",
+    include_forecast: bool = True,
+    include_observation: bool = True,
+) -> Tuple[Any, Optional[pd.DataFrame], Location]:
+    point, location = await locate(address)
+    return await point_forecast(point, units, include_forecast, include_observation) + (
+        location,
+    )
 
 
 async def ffg(address: str, valid: Optional[datetime.datetime] = None) -> pd.DataFrame:
     params = {}
-    point = locate(address)[0]
+    point = (await locate(address))[0]
     params["lon"] = point.lon
     params["lat"] = point.lat
     if valid:
         if valid.tzinfo is None:
             raise ValueError("A time zone must be specified.")
         params["valid"] = valid.isoformat()
-    async with aiohttp.ClientSession(
-        base_url=BASE_URL_IEM, raise_for_status=True
-    ) as session:
-        data = await fetch(session, f"{BASE_API_PATH_IEM}/ffg_bypoint.json", **params)
-        return pd.DataFrame(data["ffg"])
+    session = get_session(BASE_URL_IEM)
+    data = await fetch(session, f"{BASE_API_PATH_IEM}/ffg_bypoint.json", **params)
+    return pd.DataFrame(data["ffg"])
 
 
 async def spc_wpc_outlook(
@@ -0,0 +1,161 @@
+"""Per-host rate limiting and concurrency bulkheads with request priorities."""
+
+import time
+import heapq
+import asyncio
+import itertools
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Dict, List, Tuple
+
+
+class Priority(IntEnum):
+    """Lower values are served first."""
+
+    CRITICAL = 0  # the alert poll
+    BACKGROUND = 1  # other pollers
+    INTERACTIVE = 2  # slash commands
+
+
+request_priority: ContextVar[Priority] = ContextVar(
+    "request_priority", default=Priority.INTERACTIVE
+)
+
+
+@contextmanager
+def priority(level: Priority):
+    """Send every request made inside this block with the given priority."""
+    token = request_priority.set(level)
+    try:
+        yield
+    finally:
+        request_priority.reset(token)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> bool:
+        """Take a token, waiting for one if necessary. Returns whether it waited."""
+        waited = False
+        self._refill()
+        while self.tokens < 1:
+            waited = True
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+            self._refill()
+        self.tokens -= 1
+        return waited
+
+    def take(self) -> None:
+        """Take a token without waiting, borrowing from the future if need be."""
+        self._refill()
+        self.tokens -= 1
+
+
+class Bulkhead:
+    """
+    A semaphore that admits waiters in priority order and keeps `reserved`
+    slots that only non-interactive requests may use.
+    """
+
+    def __init__(self, limit: int, reserved: int = 1) -> None:
+        self.limit = limit
+        self.reserved = min(reserved, limit - 1)
+        self.active = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+
+    def _has_room(self, level: Priority) -> bool:
+        if level >= Priority.INTERACTIVE:
+            return self.active < self.limit - self.reserved
+        return self.active < self.limit
+
+    def _wake(self) -> None:
+        while self._waiters:
+            level, _, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if not self._has_room(level):
+                break
+            heapq.heappop(self._waiters)
+            self.active += 1
+            future.set_result(None)
+
+    async def acquire(self, level: Priority) -> None:
+        if self._has_room(level) and (not self._waiters or level < self._waiters[0][0]):
+            self.active += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (level, next(self._counter), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # We were admitted just as we were cancelled.
+                self.release()
+            raise
+
+    def release(self) -> None:
+        self.active -= 1
+        self._wake()
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+
+class HostLimiter:
+    def __init__(
+        self, rate: float, burst: int, concurrency: int, reserved: int = 1
+    ) -> None:
+        self.bucket = TokenBucket(rate, burst)
+        self.bulkhead = Bulkhead(concurrency, reserved)
+        self.throttled = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.bulkhead.acquire(request_priority.get())
+        try:
+            if await self.bucket.acquire():
+                self.throttled += 1
+            yield
+        finally:
+            self.bulkhead.release()
+
+
+# requests per second, burst, concurrent requests
+DEFAULT_LIMITS = (5.0, 10, 8)
+HOST_LIMITS: Dict[str, Tuple[float, int, int]] = {
+    "api.weather.gov": (5.0, 10, 8),
+    "mesonet.agron.iastate.edu": (2.0, 4, 4),
+    "weather.im": (1.0, 2, 2),
+}
+limiters: Dict[str, HostLimiter] = {}
+
+
+def configure_host(host: str, rate: float, burst: int, concurrency: int) -> None:
+    HOST_LIMITS[host] = (rate, burst, concurrency)
+    limiters.pop(host, None)
+
+
+def get_limiter(host: str) -> HostLimiter:
+    limiter = limiters.get(host)
+    if limiter is None:
+        limiter = limiters[host] = HostLimiter(*HOST_LIMITS.get(host, DEFAULT_LIMITS))
+    return limiter
+
+
+def slot(host: str):
+    """Wait for a rate limit token and a bulkhead slot for `host`."""
+    return get_limiter(host).slot()
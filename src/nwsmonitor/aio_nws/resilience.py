@@ -0,0 +1,247 @@
+"""Retry, backoff, circuit breaking and request hedging for upstream calls."""
+
+import time
+import random
+import asyncio
+import logging
+import aiohttp
+from collections import Counter
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, FrozenSet, Mapping, Optional, TypeVar
+from . import ratelimit
+
+T = TypeVar("T")
+_log = logging.getLogger(__name__)
+
+
+class HTTPStatusError(RuntimeError):
+    """An upstream server responded with an unexpected status."""
+
+    def __init__(self, message: str, status: int, headers: Mapping[str, str]):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers
+
+
+class CircuitOpenError(RuntimeError):
+    """The circuit breaker for a host is open; the request was not sent."""
+
+    def __init__(self, host: str, retry_after: float):
+        super().__init__(
+            f"Circuit breaker for {host} is open. Retry in {retry_after:.0f} seconds."
+        )
+        self.host = host
+        self.retry_after = retry_after
+
+
+@dataclass
+class ResiliencePolicy:
+    # Retries (jittered exponential backoff)
+    max_attempts: int = 4
+    base_delay: float = 1.0
+    max_delay: float = 30.0
+    retry_statuses: FrozenSet[int] = field(
+        default_factory=lambda: frozenset({429, 500, 502, 503, 504})
+    )
+    # Circuit breaker
+    failure_threshold: int = 5
+    reset_timeout: float = 60.0
+    # Hedged requests. None disables hedging entirely.
+    hedge_delay: Optional[float] = 3.0
+
+
+policy = ResiliencePolicy()
+# How often each mechanism triggered, e.g. counters["retries"].
+counters: Counter = Counter()
+
+
+def configure(**kwargs) -> None:
+    """Override fields of the global policy, e.g. from the config file."""
+    for name, value in kwargs.items():
+        if not hasattr(policy, name):
+            raise ValueError(f"Unknown resilience setting: {name}")
+        if name == "retry_statuses":
+            value = frozenset(value)
+        setattr(policy, name, value)
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, host: str) -> None:
+        self.host = host
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def before_request(self) -> None:
+        if self.state == self.CLOSED:
+            return
+        remaining = self.opened_at + policy.reset_timeout - time.monotonic()
+        if self.state == self.OPEN and remaining <= 0:
+            # Let a single probe through.
+            self.state = self.HALF_OPEN
+            return
+        counters["circuit_rejections"] += 1
+        raise CircuitOpenError(self.host, max(remaining, 0))
+
+    def record_success(self) -> None:
+        if self.state != self.CLOSED:
+            _log.info(f"Circuit breaker for {self.host} closed.")
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == self.HALF_OPEN or (
+            self.state == self.CLOSED and self.failures >= policy.failure_threshold
+        ):
+            _log.warning(
+                f"Circuit breaker for {self.host} opened after "
+                f"{self.failures} consecutive failure(s)."
+            )
+            counters["circuit_opened"] += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def record_cancelled(self) -> None:
+        # The probe was abandoned and told us nothing. Let the next request
+        # try again instead of rejecting everything while half-open.
+        if self.state == self.HALF_OPEN:
+            self.state = self.OPEN
+
+
+breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(host: str) -> CircuitBreaker:
+    breaker = breakers.get(host)
+    if breaker is None:
+        breaker = breakers[host] = CircuitBreaker(host)
+    return breaker
+
+
+def _status(error: BaseException) -> Optional[int]:
+    if isinstance(error, (HTTPStatusError, aiohttp.ClientResponseError)):
+        return error.status
+    return None
+
+
+def _is_upstream_failure(error: BaseException) -> bool:
+    """Whether `error` says something about the health of the host."""
+    status = _status(error)
+    if status is not None:
+        return status in policy.retry_statuses
+    return isinstance(
+        error,
+        (
+            aiohttp.ClientConnectionError,
+            aiohttp.ClientPayloadError,
+            asyncio.TimeoutError,
+        ),
+    )
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    headers = getattr(error, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff for the given (0-based) attempt."""
+    return random.uniform(0, min(policy.max_delay, policy.base_delay * 2**attempt))
+
+
+async def _hedged(request: Callable[[], Awaitable[T]]) -> T:
+    """
+    Send `request`, and if it hasn't finished after `policy.hedge_delay`
+    seconds, send it again. Whichever succeeds first wins.
+    """
+    first = asyncio.ensure_future(request())
+    done, _ = await asyncio.wait({first}, timeout=policy.hedge_delay)
+    if done:
+        return first.result()
+    counters["hedges"] += 1
+    second = asyncio.ensure_future(request())
+    pending = {first, second}
+    error = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task.exception() is None:
+                    if task is second:
+                        counters["hedge_wins"] += 1
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def call(
+    host: str, request: Callable[[], Awaitable[T]], hedge: bool = False
+) -> T:
+    """
+    Run `request` against `host` under the global resilience policy and the
+    host's rate limiter.
+    """
+    breaker = get_breaker(host)
+
+    async def limited_request() -> T:
+        async with ratelimit.slot(host):
+            return await request()
+
+    for attempt in range(policy.max_attempts):
+        breaker.before_request()
+        try:
+            if hedge and policy.hedge_delay is not None:
+                return_value = await _hedged(limited_request)
+            else:
+                return_value = await limited_request()
+        except asyncio.CancelledError:
+            breaker.record_cancelled()
+            raise
+        except Exception as e:
+            if not _is_upstream_failure(e):
+                # The host answered; the request itself was bad.
+                breaker.record_success()
+                raise
+            breaker.record_failure()
+            if attempt + 1 >= policy.max_attempts or breaker.state == breaker.OPEN:
+                raise
+            delay = _retry_after(e)
+            if delay is None:
+                delay = backoff(attempt)
+            elif delay > policy.max_delay:
+                # Not worth waiting for. Let the caller decide.
+                raise
+            else:
+                counters["retry_after_honored"] += 1
+            counters["retries"] += 1
+            _log.warning(
+                f"Request to {host} failed ({e!r}). "
+                f"Retrying in {delay:.1f} seconds (attempt {attempt + 2})."
+            )
+            await asyncio.sleep(delay)
+        else:
+            breaker.record_success()
+            return return_value
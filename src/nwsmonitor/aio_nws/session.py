@@ -0,0 +1,58 @@
+"""Long-lived, pooled HTTP clients shared by the whole aio_nws package."""
+
+import aiohttp
+import logging
+from typing import Dict
+
+# Connector tuning. These apply to every upstream host.
+CONNECTION_LIMIT = 100
+CONNECTION_LIMIT_PER_HOST = 10
+DNS_CACHE_TTL = 300  # seconds
+KEEPALIVE_TIMEOUT = 60  # seconds
+_log = logging.getLogger(__name__)
+_sessions: Dict[str, aiohttp.ClientSession] = {}
+
+
+def _new_session(base_url: str) -> aiohttp.ClientSession:
+    connector = aiohttp.TCPConnector(
+        limit=CONNECTION_LIMIT,
+        limit_per_host=CONNECTION_LIMIT_PER_HOST,
+        use_dns_cache=True,
+        ttl_dns_cache=DNS_CACHE_TTL,
+        keepalive_timeout=KEEPALIVE_TIMEOUT,
+    )
+    # IEM is really picky with encoding, so redirects must not be requoted.
+    return aiohttp.ClientSession(
+        base_url=base_url,
+        connector=connector,
+        requote_redirect_url=False,
+    )
+
+
+def get_session(base_url: str) -> aiohttp.ClientSession:
+    """
+    Return the shared session for `base_url`, creating it if necessary.
+    Must be called from within a running event loop.
+    """
+    session = _sessions.get(base_url)
+    if session is None or session.closed:
+        _log.debug(f"Opening HTTP session for {base_url}")
+        session = _new_session(base_url)
+        _sessions[base_url] = session
+    return session
+
+
+def open_sessions(*base_urls: str) -> None:
+    """Eagerly open sessions so the first request doesn't pay for it."""
+    for base_url in base_urls:
+        get_session(base_url)
+
+
+async def close_sessions() -> None:
+    """Close every shared session. They are reopened on next use."""
+    sessions = list(_sessions.values())
+    _sessions.clear()
+    for session in sessions:
+        if not session.closed:
+            await session.close()
+    _log.debug(f"Closed {len(sessions)} HTTP session(s)")
@@ -1,32 +1,39 @@
 import aiohttp
 import pandas as pd
 from .rss_parser import RSSParser
+from . import nws
 from .nws import USER_AGENT
+from .session import get_session
+from . import resilience
 
-SPC_FEED_URL = "https://weather.im/iembot-rss/room/spcchat.xml"
-WPC_FEED_URL = "https://weather.im/iembot-rss/room/wpcchat.xml"
+SPC_FEED_PATH = "/iembot-rss/room/spcchat.xml"
+WPC_FEED_PATH = "/iembot-rss/room/wpcchat.xml"
+SPC_FEED_URL = f"{nws.BASE_URL_WEATHER_IM}{SPC_FEED_PATH}"
+WPC_FEED_URL = f"{nws.BASE_URL_WEATHER_IM}{WPC_FEED_PATH}"
 
 
 async def _fetch(session, uri) -> pd.DataFrame:
     headers = {"User-Agent": USER_AGENT}
     parser = RSSParser()
-    parser.reset()  # make sure there are no residual data
-    async with session.get(
-        uri,
-        headers=headers,
-        raise_for_status=True,
-        timeout=aiohttp.ClientTimeout(total=60),
-    ) as resp:
-        parser.feed(await resp.text())
-        article_list = parser.article_list
-        return pd.DataFrame(article_list)
+
+    async def request() -> pd.DataFrame:
+        parser.reset()  # make sure there are no residual data
+        async with session.get(
+            uri,
+            headers=headers,
+            raise_for_status=True,
+            timeout=aiohttp.ClientTimeout(total=60),
+        ) as resp:
+            parser.feed(await resp.text())
+            article_list = parser.article_list
+            return pd.DataFrame(article_list)
+
+    return await resilience.call(session._base_url.host, request)
 
 
 async def fetch_spc_feed() -> pd.DataFrame:
-    async with aiohttp.ClientSession() as session:
-        return await _fetch(session, SPC_FEED_URL)
+    return await _fetch(get_session(nws.BASE_URL_WEATHER_IM), SPC_FEED_PATH)
 
 
 async def fetch_wpc_feed() -> pd.DataFrame:
-    async with aiohttp.ClientSession() as session:
-        return await _fetch(session, WPC_FEED_URL)
+    return await _fetch(get_session(nws.BASE_URL_WEATHER_IM), WPC_FEED_PATH)
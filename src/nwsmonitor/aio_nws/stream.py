@@ -0,0 +1,147 @@
+"""Incremental parser for the "@graph" array of JSON-LD responses."""
+
+import re
+import json
+import aiohttp
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+# The fields the bot actually uses from an alert.
+ALERT_FIELDS = (
+    "id",
+    "areaDesc",
+    "sent",
+    "onset",
+    "ends",
+    "messageType",
+    "event",
+    "senderName",
+    "headline",
+    "description",
+    "instruction",
+    "parameters",
+    "expires",
+    "status",
+)
+CHUNK_SIZE = 64 * 1024
+_STRUCTURE = re.compile(rb'[{}\[\]"]')
+_STRING_END = re.compile(rb'["\\]')
+_QUOTE, _LBRACE, _LBRACKET, _RBRACE = 0x22, 0x7B, 0x5B, 0x7D
+
+
+class GraphSplitter:
+    """
+    Split a JSON-LD document into the raw bytes of each object in its
+    top-level "@graph" array, without holding the whole document in memory.
+    Only the object currently being parsed is buffered.
+    """
+
+    def __init__(self, key: str = "@graph") -> None:
+        self._key = key.encode()
+        self._buf = bytearray()
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._str_start = 0
+        self._last_key: Optional[bytes] = None
+        self._graph_depth: Optional[int] = None
+        self._obj_start: Optional[int] = None
+        self.found = False
+        self.done = False
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        if self.done:
+            return []
+        buf = self._buf
+        buf += chunk
+        pos = self._pos
+        objects = []
+        while True:
+            if self._in_string:
+                m = _STRING_END.search(buf, pos)
+                if m is None:
+                    pos = len(buf)
+                    break
+                if buf[m.start()] != _QUOTE:
+                    # Backslash: skip the escaped byte once we have it.
+                    if m.end() >= len(buf):
+                        pos = m.start()
+                        break
+                    pos = m.end() + 1
+                    continue
+                self._in_string = False
+                pos = m.end()
+                if self._depth == 1 and not self.found:
+                    self._last_key = bytes(buf[self._str_start + 1 : m.start()])
+                continue
+            m = _STRUCTURE.search(buf, pos)
+            if m is None:
+                pos = len(buf)
+                break
+            c = buf[m.start()]
+            pos = m.end()
+            if c == _QUOTE:
+                self._in_string = True
+                self._str_start = m.start()
+            elif c == _LBRACE or c == _LBRACKET:
+                if (
+                    c == _LBRACKET
+                    and not self.found
+                    and self._depth == 1
+                    and self._last_key == self._key
+                ):
+                    self.found = True
+                    self._graph_depth = self._depth + 1
+                elif c == _LBRACE and self._depth == self._graph_depth:
+                    self._obj_start = m.start()
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._graph_depth is None:
+                    continue
+                if self._depth == self._graph_depth and c == _RBRACE:
+                    objects.append(bytes(buf[self._obj_start : pos]))
+                    self._obj_start = None
+                elif self._depth < self._graph_depth:
+                    self.done = True
+                    break
+        # Drop everything we no longer need.
+        if self._obj_start is not None:
+            keep = self._obj_start
+        elif self._in_string:
+            keep = self._str_start
+        else:
+            keep = pos
+        del buf[:keep]
+        self._pos = pos - keep
+        self._str_start -= keep
+        if self._obj_start is not None:
+            self._obj_start -= keep
+        return objects
+
+
+def _slim(record: Dict[str, Any], fields: Optional[Sequence[str]]) -> Dict[str, Any]:
+    if fields is None:
+        return record
+    return {field: record.get(field) for field in fields}
+
+
+async def iter_graph(
+    content: aiohttp.StreamReader,
+    fields: Optional[Sequence[str]] = None,
+    hasher: Any = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Yield the objects of a response's "@graph" array one at a time, keeping
+    only `fields` (or everything if None). If given, `hasher` is updated with
+    every chunk of the raw body.
+    """
+    splitter = GraphSplitter()
+    async for chunk in content.iter_chunked(CHUNK_SIZE):
+        if hasher is not None:
+            hasher.update(chunk)
+        for raw in splitter.feed(chunk):
+            yield _slim(json.loads(raw), fields)
+    if not splitter.found:
+        raise RuntimeError("Response does not contain a @graph array.")
+    if not splitter.done:
+        raise RuntimeError("Response ended in the middle of the @graph array.")
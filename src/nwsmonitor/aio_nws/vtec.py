@@ -0,0 +1,196 @@
+"""
+Valid Time Event Code (VTEC) parsing and event tracking.
+
+See NWS Directive 10-1703 for the format. P-VTEC identifies an event:
+/k.aaa.cccc.pp.s.####.yymmddThhnnZ-yymmddThhnnZ/
+H-VTEC adds hydrologic details for some flood products:
+/nwsli.s.ic.yymmddThhnnZ.yymmddThhnnZ.yymmddThhnnZ.fr/
+"""
+
+import datetime
+import functools
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+# Actions after which an event is no longer in effect
+TERMINAL_ACTIONS = frozenset({"CAN", "EXP", "UPG"})
+# Ended events are forgotten this long after their last action.
+RETENTION = datetime.timedelta(hours=24)
+
+
+class EventKey(NamedTuple):
+    office: str
+    phenomena: str
+    significance: str
+    etn: int
+
+
+class Vtec(NamedTuple):
+    """A P-VTEC string, e.g. /O.NEW.KOUN.TO.W.0042.240504T2300Z-240505T0000Z/"""
+
+    product_class: str
+    action: str
+    office: str
+    phenomena: str
+    significance: str
+    etn: int
+    begin: Optional[datetime.datetime]
+    end: Optional[datetime.datetime]
+
+    @property
+    def key(self) -> EventKey:
+        return EventKey(self.office, self.phenomena, self.significance, self.etn)
+
+
+class HVtec(NamedTuple):
+    """An H-VTEC string, e.g. /MSSM5.2.ER.240504T1200Z.240505T0600Z.000000T0000Z.NR/"""
+
+    nwsli: str
+    severity: str
+    immediate_cause: str
+    begin: Optional[datetime.datetime]
+    crest: Optional[datetime.datetime]
+    end: Optional[datetime.datetime]
+    flood_record: str
+
+
+def _time(value: str) -> Optional[datetime.datetime]:
+    if value.startswith("000000"):  # "until further notice"
+        return None
+    return datetime.datetime.strptime(value, "%y%m%dT%H%MZ").replace(
+        tzinfo=datetime.timezone.utc
+    )
+
+
+@functools.lru_cache(maxsize=4096)
+def parse(vtec: str) -> Union[Vtec, HVtec, None]:
+    """Parse a P-VTEC or H-VTEC string, or return None if it is neither."""
+    try:
+        parts = vtec.strip().strip("/").split(".")
+        if len(parts) != 7:
+            return None
+        if "-" in parts[6]:
+            k, action, office, phenomena, significance, etn, times = parts
+            begin, end = times.split("-")
+            return Vtec(
+                k,
+                action,
+                office,
+                phenomena,
+                significance,
+                int(etn),
+                _time(begin),
+                _time(end),
+            )
+        nwsli, severity, cause, begin, crest, end, record = parts
+        return HVtec(
+            nwsli, severity, cause, _time(begin), _time(crest), _time(end), record
+        )
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def parse_all(vtecs: Iterable[str]) -> Tuple[List[Vtec], List[HVtec]]:
+    """Split an alert's VTEC strings into P-VTEC and H-VTEC."""
+    pvtecs, hvtecs = [], []
+    for vtec in vtecs:
+        parsed = parse(vtec)
+        if isinstance(parsed, Vtec):
+            pvtecs.append(parsed)
+        elif isinstance(parsed, HVtec):
+            hvtecs.append(parsed)
+    return pvtecs, hvtecs
+
+
+@dataclass
+class Event:
+    key: EventKey
+    # (action, alert ID, sent time), oldest first
+    history: List[Tuple[str, str, Optional[datetime.datetime]]] = field(
+        default_factory=list
+    )
+    end: Optional[datetime.datetime] = None
+
+    @property
+    def action(self) -> Optional[str]:
+        return self.history[-1][0] if self.history else None
+
+    @property
+    def ended(self) -> bool:
+        # A partial cancellation can come as a CAN and a CON sent together,
+        # in either order, so look at everything sent last.
+        if not self.history:
+            return False
+        latest = self.history[-1][2]
+        for _, _, sent in self.history:
+            if sent is not None and (latest is None or sent > latest):
+                latest = sent
+        return all(
+            action in TERMINAL_ACTIONS
+            for action, _, sent in self.history
+            if sent == latest
+        )
+
+
+class EventTracker:
+    """
+    Follows each VTEC event through its life (NEW, CON, EXT, ..., CAN/EXP)
+    by office, phenomenon, significance and ETN.
+    """
+
+    def __init__(self) -> None:
+        self.events: Dict[EventKey, Event] = {}
+        self.collapsed = 0
+
+    def get(self, key: EventKey) -> Optional[Event]:
+        return self.events.get(key)
+
+    def observe(
+        self,
+        alert_id: str,
+        vtecs: Iterable[Vtec],
+        sent: Optional[datetime.datetime] = None,
+    ) -> bool:
+        """
+        Record an alert's VTEC actions. Returns False if the alert is
+        redundant: every event it mentions had already ended and it only
+        ends them again (e.g. an EXP after a CAN).
+        """
+        redundant = True
+        seen_any = False
+        for vtec in vtecs:
+            seen_any = True
+            event = self.events.get(vtec.key)
+            if event is None:
+                event = self.events[vtec.key] = Event(vtec.key)
+            if any(alert_id == i for _, i, _ in event.history):
+                redundant = False  # same alert seen again, e.g. an update
+                continue
+            if not (event.ended and vtec.action in TERMINAL_ACTIONS):
+                redundant = False
+            event.history.append((vtec.action, alert_id, sent))
+            if vtec.end is not None:
+                event.end = vtec.end
+        if seen_any and redundant:
+            self.collapsed += 1
+            return False
+        return True
+
+    def prune(self, now: Optional[datetime.datetime] = None) -> None:
+        """Forget events that ended or ran out long enough ago."""
+        if now is None:
+            now = datetime.datetime.now(datetime.timezone.utc)
+        cutoff = now - RETENTION
+        for key, event in list(self.events.items()):
+            last_sent = event.history[-1][2] if event.history else None
+            if event.ended and (last_sent is None or last_sent < cutoff):
+                del self.events[key]
+            elif event.end is not None and event.end < cutoff:
+                del self.events[key]
+
+    def clear(self) -> None:
+        self.events.clear()
+        self.collapsed = 0
+
+
+tracker = EventTracker()
@@ -0,0 +1,50 @@
+"""Work out which alerts changed between two polls."""
+
+import json
+import hashlib
+from typing import Any, Dict, NamedTuple, Optional, Set
+from pandas import DataFrame
+
+
+class AlertDiff(NamedTuple):
+    added: Set[str]
+    updated: Set[str]  # same ID, different content
+    removed: Set[str]
+
+    @property
+    def fresh(self) -> Set[str]:
+        """Alerts that should be sent out."""
+        return self.added | self.updated
+
+
+def _clean(value: Any) -> Any:
+    # NaN and None both mean "missing", depending on how the frame was built.
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+def fingerprint(alert: Dict[str, Any]) -> str:
+    data = json.dumps(
+        {k: _clean(v) for k, v in alert.items()}, sort_keys=True, default=str
+    )
+    return hashlib.blake2b(data.encode(), digest_size=16).hexdigest()
+
+
+def fingerprints(alerts: Optional[DataFrame]) -> Dict[str, str]:
+    """Map each alert's ID to a fingerprint of its content."""
+    if alerts is None or alerts.empty:
+        return {}
+    return {alert["id"]: fingerprint(alert) for alert in alerts.to_dict("records")}
+
+
+def diff(previous: Dict[str, str], current: Dict[str, str]) -> AlertDiff:
+    added, updated = set(), set()
+    for alert_id, print_ in current.items():
+        old = previous.get(alert_id)
+        if old is None:
+            added.add(alert_id)
+        elif old != print_:
+            updated.add(alert_id)
+    removed = previous.keys() - current.keys()
+    return AlertDiff(added, updated, removed)
@@ -0,0 +1,221 @@
+"""
+Queued, concurrent delivery of Discord messages.
+
+Each channel has its own FIFO queue so that messages to one channel stay in
+order, while a bounded pool of workers serves different channels
+concurrently. A global token bucket keeps the bot under Discord's global
+rate limit; py-cord handles per-route limits (and 429s) itself.
+
+Urgent (life-safety) messages jump ahead of routine ones, both within their
+channel and in the order channels are served, and don't wait for the
+global token bucket.
+"""
+
+import io
+import time
+import asyncio
+import itertools
+import logging
+import discord
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from . import metrics
+from .aio_nws.ratelimit import TokenBucket
+
+WORKERS = 16
+GLOBAL_RATE = 40.0  # messages per second; Discord allows 50 requests/s
+GLOBAL_BURST = 40
+_log = logging.getLogger(__name__)
+
+Attachment = Tuple[str, bytes]  # filename, contents
+
+
+@dataclass
+class Message:
+    content: Optional[str]
+    attachments: Sequence[Attachment] = ()
+    queued_at: float = field(default_factory=time.monotonic)
+    urgent: bool = False
+    # Resolves to whether the message was sent. Only set for urgent messages.
+    delivered: Optional[asyncio.Future] = None
+    alert_id: Optional[str] = None  # for latency metrics
+
+    def files(self) -> List[discord.File]:
+        # discord.File objects can only be sent once, so make new ones.
+        return [
+            discord.File(io.BytesIO(data), filename=name)
+            for name, data in self.attachments
+        ]
+
+
+@dataclass
+class DeliveryStats:
+    sent: int = 0
+    failed: int = 0
+    dropped: int = 0  # channel no longer exists
+    total_latency: float = 0.0
+    max_latency: float = 0.0
+    urgent_sent: int = 0
+    # From when an emergency was issued to when its last message was sent
+    emergencies: int = 0
+    last_emergency_latency: float = 0.0
+    max_emergency_latency: float = 0.0
+
+    @property
+    def mean_latency(self) -> float:
+        return self.total_latency / self.sent if self.sent else 0.0
+
+    def record_emergency(self, latency: float) -> None:
+        self.emergencies += 1
+        self.last_emergency_latency = latency
+        self.max_emergency_latency = max(self.max_emergency_latency, latency)
+
+
+def _resolve(message: Message, sent: bool) -> None:
+    if message.delivered is not None and not message.delivered.done():
+        message.delivered.set_result(sent)
+
+
+class Delivery:
+    def __init__(self, workers: int = WORKERS) -> None:
+        self.workers = workers
+        self.bot: Optional[discord.Bot] = None
+        self.queues: Dict[int, Deque[Message]] = {}
+        self.stats = DeliveryStats()
+        self._bucket = TokenBucket(GLOBAL_RATE, GLOBAL_BURST)
+        # (0 if urgent else 1, order, channel) for channels with queued
+        # messages. A channel may be listed more than once; extra entries are
+        # skipped.
+        self._ready: "asyncio.PriorityQueue[Tuple[int, int, int]]" = (
+            asyncio.PriorityQueue()
+        )
+        self._order = itertools.count()
+        self._busy: Set[int] = set()
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def depth(self) -> int:
+        return sum(len(queue) for queue in self.queues.values())
+
+    def start(self, bot: discord.Bot) -> None:
+        self.bot = bot
+        if self._tasks:
+            return
+        self._ready = asyncio.PriorityQueue()
+        for channel_id, queue in self.queues.items():
+            if queue:
+                self._schedule(channel_id)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def stop(self) -> None:
+        """
+        Stop the workers. Undelivered messages stay queued, but anyone
+        waiting on them is told they weren't sent.
+        """
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        self._busy.clear()
+        for queue in self.queues.values():
+            for message in queue:
+                _resolve(message, False)
+
+    def _schedule(self, channel_id: int) -> None:
+        urgent = self.queues[channel_id][0].urgent
+        self._ready.put_nowait((0 if urgent else 1, next(self._order), channel_id))
+
+    def enqueue(
+        self,
+        channel_id: int,
+        content: Optional[str],
+        attachments: Sequence[Attachment] = (),
+        urgent: bool = False,
+        alert_id: Optional[str] = None,
+    ) -> Message:
+        message = Message(content, attachments, urgent=urgent, alert_id=alert_id)
+        queue = self.queues.setdefault(channel_id, deque())
+        if urgent:
+            message.delivered = asyncio.get_running_loop().create_future()
+            # After any other urgent messages, ahead of everything else.
+            position = 0
+            while position < len(queue) and queue[position].urgent:
+                position += 1
+            queue.insert(position, message)
+        else:
+            queue.append(message)
+        if channel_id not in self._busy and (urgent or len(queue) == 1):
+            self._schedule(channel_id)
+        return message
+
+    async def wait(self, messages: Iterable[Message]) -> List[bool]:
+        """
+        Wait until the given urgent messages have been sent or given up on,
+        and return whether each was sent.
+        """
+        return await asyncio.gather(*(m.delivered for m in messages if m.delivered))
+
+    async def _worker(self) -> None:
+        while True:
+            _, _, channel_id = await self._ready.get()
+            if channel_id in self._busy or not self.queues.get(channel_id):
+                continue  # a duplicate entry
+            self._busy.add(channel_id)
+            try:
+                queue = self.queues[channel_id]
+                message = queue.popleft()
+                try:
+                    await self._send(channel_id, message)
+                except asyncio.CancelledError:
+                    queue.appendleft(message)
+                    raise
+            finally:
+                self._busy.discard(channel_id)
+                if queue:
+                    # Back of the line, so that one busy channel can't hog
+                    # a worker.
+                    self._schedule(channel_id)
+                else:
+                    del self.queues[channel_id]
+
+    async def _send(self, channel_id: int, message: Message) -> None:
+        try:
+            sent = await self._deliver(channel_id, message)
+        except asyncio.CancelledError:
+            _resolve(message, False)
+            raise
+        except Exception:
+            self.stats.failed += 1
+            _log.exception(f"Could not send a message to channel {channel_id}")
+            sent = False
+        _resolve(message, sent)
+
+    async def _deliver(self, channel_id: int, message: Message) -> bool:
+        channel = self.bot.get_channel(channel_id) if self.bot else None
+        if channel is None:
+            self.stats.dropped += 1
+            return False
+        if message.urgent:
+            self._bucket.take()
+        else:
+            await self._bucket.acquire()
+        try:
+            if message.attachments:
+                await channel.send(message.content, files=message.files())
+            else:
+                await channel.send(message.content)
+        except discord.HTTPException as e:
+            self.stats.failed += 1
+            _log.warning(f"Could not send a message to channel {channel_id}: {e}")
+            return False
+        latency = time.monotonic() - message.queued_at
+        self.stats.sent += 1
+        self.stats.urgent_sent += message.urgent
+        if message.alert_id is not None:
+            metrics.alert_delivered(message.alert_id)
+        self.stats.total_latency += latency
+        self.stats.max_latency = max(self.stats.max_latency, latency)
+        return True
+
+
+delivery = Delivery()
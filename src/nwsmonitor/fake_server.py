@@ -0,0 +1,404 @@
+"""
+Local stand-in for api.weather.gov, IEM and weather.im.
+
+Serves synthetic (or recorded) responses for everything the bot polls or
+requests, with configurable latency, error rate, ETags and payload size, so
+the bot can be load-tested offline. Point the bot at it with:
+
+    NWSMONITOR_BASE_URL_NWS=http://127.0.0.1:8080
+    NWSMONITOR_BASE_URL_IEM=http://127.0.0.1:8080
+    NWSMONITOR_BASE_URL_WEATHER_IM=http://127.0.0.1:8080
+
+or the "base_urls" object in the config file. Geocoding still goes through
+Nominatim.
+"""
+
+import copy
+import json
+import time
+import random
+import asyncio
+import hashlib
+import logging
+import argparse
+import datetime
+import pathlib
+from aiohttp import web
+from dataclasses import dataclass
+from email.utils import format_datetime
+from typing import Any, Dict, List, Optional
+from .enums import AlertType, WFO
+
+here = pathlib.Path(__file__).parent.resolve()
+TEST_ALERTS = json.loads((here / "test_alerts.json").read_text())
+LD_JSON = "application/ld+json"
+# 1x1 transparent PNG
+PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000100e221bc330000000049454e44ae426082"
+)
+_log = logging.getLogger(__name__)
+
+
+@dataclass
+class FakeServerConfig:
+    latency: float = 0.0  # seconds added to every response
+    jitter: float = 0.0  # up to this many extra seconds, uniformly random
+    error_rate: float = 0.0  # fraction of requests answered with a 503
+    etags: bool = True
+    alerts: int = 100  # synthetic active alerts, in addition to the seeds
+    churn: float = 0.1  # fraction of synthetic alerts replaced per churn
+    churn_interval: float = 60.0  # seconds
+    actual: bool = False  # mark synthetic alerts "Actual" instead of "Test"
+    fixtures: Optional[pathlib.Path] = None  # recorded responses
+
+
+def _seed_alerts() -> List[Dict[str, Any]]:
+    """test_alerts.json is stored column-wise; turn it into records."""
+    return [
+        {field: values[0] for field, values in alert.items()}
+        for alert in TEST_ALERTS.values()
+    ]
+
+
+def _iso(dt: datetime.datetime) -> str:
+    return dt.replace(microsecond=0).isoformat()
+
+
+class FakeNWS:
+    def __init__(self, config: FakeServerConfig) -> None:
+        self.config = config
+        self.seeds = _seed_alerts()
+        self.serial = 0
+        self.synthetic: List[Dict[str, Any]] = []
+        self.cancellations: List[Dict[str, Any]] = []
+        self.last_churn = time.monotonic()
+        self.requests = 0
+        self.errors = 0
+        for _ in range(config.alerts):
+            self.synthetic.append(self._new_alert())
+
+    def _new_alert(self) -> Dict[str, Any]:
+        self.serial += 1
+        alert = copy.deepcopy(random.choice(self.seeds))
+        event = random.choice([a for a in AlertType if a != AlertType.TEST])
+        wfo = random.choice([w for w in WFO if w not in {WFO.AAQ, WFO.HEB}])
+        now = datetime.datetime.now(datetime.timezone.utc)
+        office = wfo.name if len(wfo.name) == 3 else "XXX"
+        etn = self.serial % 10000
+        begin = now.strftime("%y%m%dT%H%MZ")
+        end = (now + datetime.timedelta(hours=1)).strftime("%y%m%dT%H%MZ")
+        # Most alerts get a polygon; the rest are zone-based.
+        if random.random() < 0.8:
+            lat, lon = random.uniform(25, 49), random.uniform(-124, -67)
+            ring = [(lon, lat), (lon + 0.5, lat), (lon + 0.5, lat + 0.5)]
+            ring += [(lon, lat + 0.5), (lon, lat)]
+            geometry = "POLYGON((%s))" % ", ".join(f"{x:.4f} {y:.4f}" for x, y in ring)
+            ugc = []
+        else:
+            geometry = None
+            ugc = ["ILZ014"]
+        alert.update(
+            {
+                "id": f"urn:oid:fake.{self.serial}",
+                "geometry": geometry,
+                "geocode": {"UGC": ugc},
+                "areaDesc": f"Synthetic County {self.serial}",
+                "sent": _iso(now),
+                "effective": _iso(now),
+                "onset": _iso(now),
+                "expires": _iso(now + datetime.timedelta(hours=1)),
+                "ends": _iso(now + datetime.timedelta(hours=1)),
+                "messageType": "Alert",
+                "event": event.value,
+                "senderName": wfo.value,
+                "headline": f"{event.value} issued by {wfo.value}",
+                "status": "Actual" if self.config.actual else "Test",
+                "parameters": {
+                    "VTEC": [f"/O.NEW.K{office}.XX.W.{etn:04d}.{begin}-{end}/"],
+                    "isTest": not self.config.actual,
+                },
+            }
+        )
+        return alert
+
+    def _cancel(self, alert: Dict[str, Any]) -> Dict[str, Any]:
+        self.serial += 1
+        cancel = copy.deepcopy(alert)
+        cancel["id"] = f"urn:oid:fake.{self.serial}"
+        cancel["sent"] = _iso(datetime.datetime.now(datetime.timezone.utc))
+        cancel["messageType"] = "Cancel"
+        vtec = cancel["parameters"].get("VTEC")
+        if vtec:
+            cancel["parameters"]["VTEC"] = [vtec[0].replace(".NEW.", ".CAN.")]
+        return cancel
+
+    def churn(self) -> None:
+        if time.monotonic() - self.last_churn < self.config.churn_interval:
+            return
+        self.last_churn = time.monotonic()
+        count = int(len(self.synthetic) * self.config.churn)
+        for _ in range(count):
+            old = self.synthetic.pop(random.randrange(len(self.synthetic)))
+            self.cancellations.append(self._cancel(old))
+            self.synthetic.append(self._new_alert())
+        # Keep about a day's worth of cancellations.
+        del self.cancellations[: max(len(self.cancellations) - 10000, 0)]
+
+    @web.middleware
+    async def middleware(self, request: web.Request, handler) -> web.StreamResponse:
+        self.requests += 1
+        delay = self.config.latency + random.uniform(0, self.config.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+        if random.random() < self.config.error_rate:
+            self.errors += 1
+            return web.json_response(
+                {"title": "Service Unavailable"},
+                status=503,
+                headers={"Retry-After": "1"},
+            )
+        fixture = self._fixture(request)
+        if fixture is not None:
+            return self._respond(request, fixture, "application/json")
+        return await handler(request)
+
+    def _fixture(self, request: web.Request) -> Optional[bytes]:
+        if self.config.fixtures is None:
+            return None
+        path = self.config.fixtures / request.path.strip("/")
+        for candidate in (path, path.with_name(path.name + ".json")):
+            if candidate.is_file():
+                return candidate.read_bytes()
+        return None
+
+    def _respond(
+        self, request: web.Request, body: bytes, content_type: str
+    ) -> web.Response:
+        headers = {"Cache-Control": "public, max-age=0"}
+        if self.config.etags:
+            etag = f'"{hashlib.md5(body).hexdigest()}"'
+            headers["ETag"] = etag
+            if request.headers.get("If-None-Match") == etag:
+                return web.Response(status=304, headers=headers)
+        return web.Response(body=body, content_type=content_type, headers=headers)
+
+    def _json(self, request: web.Request, data: Any, ld: bool = False) -> web.Response:
+        body = json.dumps(data).encode()
+        return self._respond(request, body, LD_JSON if ld else "application/json")
+
+    # api.weather.gov
+
+    async def active_alerts(self, request: web.Request) -> web.Response:
+        self.churn()
+        graph = self.seeds + self.synthetic
+        return self._json(request, {"@context": {}, "@graph": graph}, ld=True)
+
+    async def alerts(self, request: web.Request) -> web.Response:
+        self.churn()
+        graph = self.seeds + self.synthetic + self.cancellations
+        message_type = request.query.get("message_type")
+        if message_type:
+            graph = [a for a in graph if a["messageType"].lower() == message_type]
+        start = request.query.get("start")
+        if start:
+            start = datetime.datetime.fromisoformat(start)
+            graph = [
+                a for a in graph if datetime.datetime.fromisoformat(a["sent"]) >= start
+            ]
+        return self._json(request, {"@context": {}, "@graph": graph}, ld=True)
+
+    async def alert(self, request: web.Request) -> web.Response:
+        alert_id = request.match_info["id"]
+        for alert in self.seeds + self.synthetic + self.cancellations:
+            if alert["id"] == alert_id:
+                return self._json(request, {"@context": {}, **alert}, ld=True)
+        raise web.HTTPNotFound()
+
+    async def active_alerts_count(self, request: web.Request) -> web.Response:
+        total = len(self.seeds) + len(self.synthetic)
+        return self._json(
+            request,
+            {
+                "total": total,
+                "land": total,
+                "marine": 0,
+                "regions": {},
+                "areas": {},
+                "zones": {},
+            },
+        )
+
+    async def points(self, request: web.Request) -> web.Response:
+        lat, lon = (float(v) for v in request.match_info["point"].split(","))
+        x, y = int(abs(lon) * 10) % 200, int(abs(lat) * 10) % 200
+        return self._json(
+            request,
+            {
+                "cwa": "LOT",
+                "gridX": x,
+                "gridY": y,
+                "forecastZone": "https://api.weather.gov/zones/forecast/ILZ014",
+                "county": "https://api.weather.gov/zones/county/ILC031",
+            },
+            ld=True,
+        )
+
+    async def forecast(self, request: web.Request) -> web.Response:
+        periods = [
+            {
+                "number": i + 1,
+                "name": f"Period {i + 1}",
+                "icon": "https://api.weather.gov/icons/land/day/few?size=medium",
+                "detailedForecast": "Synthetic forecast. Sunny, with a high near 70.",
+            }
+            for i in range(14)
+        ]
+        return self._json(request, {"periods": periods}, ld=True)
+
+    async def stations(self, request: web.Request) -> web.Response:
+        graph = [{"stationIdentifier": "KORD", "name": "Chicago O'Hare"}]
+        return self._json(request, {"@graph": graph}, ld=True)
+
+    async def latest_observation(self, request: web.Request) -> web.Response:
+        station = request.match_info["station"]
+        now = datetime.datetime.now(datetime.timezone.utc)
+
+        def value(v):
+            return {"value": v}
+
+        return self._json(
+            request,
+            {
+                "stationId": station,
+                "stationName": f"Synthetic station {station}",
+                "timestamp": _iso(now),
+                "icon": "https://api.weather.gov/icons/land/day/few?size=medium",
+                "textDescription": "Mostly Clear",
+                "temperature": value(21.0),
+                "dewpoint": value(12.0),
+                "relativeHumidity": value(56.0),
+                "windDirection": value(230),
+                "windSpeed": value(15.0),
+                "windGust": value(None),
+                "visibility": value(16090),
+                "barometricPressure": value(101500),
+                "windChill": value(None),
+                "heatIndex": value(None),
+            },
+            ld=True,
+        )
+
+    async def glossary(self, request: web.Request) -> web.Response:
+        terms = [
+            {"term": "Supercell", "definition": "<p>A rotating thunderstorm.</p>"},
+            {"term": "Derecho", "definition": "<p>A widespread wind storm.</p>"},
+        ]
+        return self._json(request, {"glossary": terms})
+
+    # IEM
+
+    async def afos_list(self, request: web.Request) -> web.Response:
+        pil = request.query.get("pil", "AFDLOT")
+        data = [{"product_id": f"202410041800-KLOT-FXUS63-{pil}", "pil": pil}]
+        return self._json(request, {"data": data})
+
+    async def nwstext(self, request: web.Request) -> web.Response:
+        return web.Response(text=f"Synthetic text product {request.match_info['pid']}")
+
+    async def ffg(self, request: web.Request) -> web.Response:
+        return self._json(request, {"ffg": [{"hour01": 1.5, "hour03": 2.1}]})
+
+    async def autoplot(self, request: web.Request) -> web.Response:
+        html = '<html><body><img id="theimage" src="/plotting/auto/plot.png"></body></html>'
+        return web.Response(text=html, content_type="text/html")
+
+    async def autoplot_image(self, request: web.Request) -> web.Response:
+        return web.Response(body=PNG, content_type="image/png")
+
+    # weather.im
+
+    async def rss(self, request: web.Request) -> web.Response:
+        room = request.match_info["room"]
+        now = datetime.datetime.now(datetime.timezone.utc)
+        # A new item every churn interval.
+        stamp = int(now.timestamp() // max(self.config.churn_interval, 1))
+        items = []
+        for i in range(5):
+            pubdate = format_datetime(
+                datetime.datetime.fromtimestamp(
+                    (stamp - i) * max(self.config.churn_interval, 1),
+                    datetime.timezone.utc,
+                )
+            )
+            items.append(
+                f"<item><title>{room} synthetic item {stamp - i}</title>"
+                f"<link>https://example.invalid/{stamp - i}</link>"
+                f"<description><![CDATA[\nSynthetic product {stamp - i}\n]]></description>"
+                f"<pubDate>{pubdate}</pubDate></item>"
+            )
+        body = f"<rss><channel>{''.join(items)}</channel></rss>"
+        return web.Response(text=body, content_type="application/rss+xml")
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self.middleware])
+        app.add_routes(
+            [
+                web.get("/alerts/active", self.active_alerts),
+                web.get("/alerts/active/count", self.active_alerts_count),
+                web.get("/alerts", self.alerts),
+                web.get("/alerts/{id}", self.alert),
+                web.get("/points/{point}", self.points),
+                web.get(r"/gridpoints/{wfo}/{xy}/forecast", self.forecast),
+                web.get(r"/gridpoints/{wfo}/{xy}/stations", self.stations),
+                web.get(
+                    "/stations/{station}/observations/latest", self.latest_observation
+                ),
+                web.get("/glossary", self.glossary),
+                web.get("/api/1/nws/afos/list.json", self.afos_list),
+                web.get("/api/1/nwstext/{pid}", self.nwstext),
+                web.get("/api/1/ffg_bypoint.json", self.ffg),
+                web.get("/plotting/auto/", self.autoplot),
+                web.get("/plotting/auto/plot.png", self.autoplot_image),
+                web.get("/iembot-rss/room/{room}.xml", self.rss),
+            ]
+        )
+        return app
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="nwsmonitor.fake_server",
+        description="Serve fake NWS, IEM and weather.im responses for load testing.",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="0 to 1")
+    parser.add_argument("--no-etag", action="store_true", help="Don't send ETags")
+    parser.add_argument("--alerts", type=int, default=100, help="Synthetic alerts")
+    parser.add_argument("--churn", type=float, default=0.1, help="0 to 1")
+    parser.add_argument("--churn-interval", type=float, default=60.0, help="Seconds")
+    parser.add_argument(
+        "--actual", action="store_true", help='Mark synthetic alerts "Actual"'
+    )
+    parser.add_argument("--fixtures", type=pathlib.Path, help="Recorded responses")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    config = FakeServerConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        etags=not args.no_etag,
+        alerts=args.alerts,
+        churn=args.churn,
+        churn_interval=args.churn_interval,
+        actual=args.actual,
+        fixtures=args.fixtures,
+    )
+    web.run_app(FakeNWS(config).app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
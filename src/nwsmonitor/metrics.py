@@ -0,0 +1,118 @@
+"""
+Latency of the alert pipeline, from NWS issuing an alert to our message
+appearing in Discord.
+
+Each stage of `update_alerts` is timed with `span`. Alert JSON is decoded
+while the response streams in, so it counts towards "fetch"; "build" is
+turning the rows into `Alert` objects. Each alert is stamped when it is
+first seen and when its first message is delivered, so an alert sent to many
+guilds still counts once. Only the most recent samples are kept, in memory.
+"""
+
+import time
+import math
+from collections import OrderedDict, defaultdict, deque
+from contextlib import contextmanager
+from io import StringIO
+from typing import Deque, Dict, List, Optional, Tuple
+
+STAGES = ("fetch", "diff", "build", "classify", "render", "deliver")
+PERCENTILES = (50, 95, 99)
+SAMPLES = 1000  # per histogram
+MAX_PENDING = 5000  # alerts waiting to be delivered
+
+
+class Histogram:
+    """The last `SAMPLES` values, for percentiles."""
+
+    def __init__(self, size: int = SAMPLES) -> None:
+        self.samples: Deque[float] = deque(maxlen=size)
+        self.count = 0
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+    def record(self, value: float) -> None:
+        self.samples.append(value)
+        self.count += 1
+
+    def percentiles(self, *ps: float) -> List[float]:
+        """Nearest-rank percentiles, or NaN if there are no samples."""
+        values = sorted(self.samples)
+        if not values:
+            return [math.nan for _ in ps]
+        return [values[max(math.ceil(p / 100 * len(values)), 1) - 1] for p in ps]
+
+
+stages: Dict[str, Histogram] = defaultdict(Histogram)
+# Alert class -> time from being issued to being seen by a poll
+seen_latency: Dict[str, Histogram] = defaultdict(Histogram)
+# Alert class -> time from being issued to the first message being delivered
+delivered_latency: Dict[str, Histogram] = defaultdict(Histogram)
+# Alert ID -> (sent, first seen, alert class, delivered), times as UNIX
+# timestamps
+_pending: "OrderedDict[str, Tuple[Optional[float], float, str, bool]]" = OrderedDict()
+
+
+@contextmanager
+def span(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stages[stage].record(time.perf_counter() - start)
+
+
+def alert_seen(alert_id: str, sent: Optional[float], alert_class: str) -> None:
+    """Stamp an alert with when it was sent and first seen."""
+    if alert_id in _pending:
+        return
+    now = time.time()
+    _pending[alert_id] = (sent, now, alert_class, False)
+    if len(_pending) > MAX_PENDING:
+        _pending.popitem(last=False)
+    if sent is not None:
+        seen_latency[alert_class].record(now - sent)
+
+
+def alert_delivered(alert_id: str) -> None:
+    """Stamp the first delivery of a message for an alert."""
+    try:
+        sent, first_seen, alert_class, delivered = _pending[alert_id]
+    except KeyError:
+        return
+    if delivered:
+        return
+    now = time.time()
+    _pending[alert_id] = (sent, first_seen, alert_class, True)
+    stages["deliver"].record(now - first_seen)
+    if sent is not None:
+        delivered_latency[alert_class].record(now - sent)
+
+
+def _row(ss: StringIO, name: str, histogram: Histogram) -> None:
+    p50, p95, p99 = histogram.percentiles(*PERCENTILES)
+    ss.write(f"{name:<22}{histogram.count:>7}{p50:>9.3f}{p95:>9.3f}{p99:>9.3f}\n")
+
+
+def report() -> str:
+    """A table of percentiles per stage and per alert class, in seconds."""
+    header = f"{'':<22}{'count':>7}{'p50':>9}{'p95':>9}{'p99':>9}\n"
+    with StringIO() as ss:
+        ss.write("Pipeline stages\n" + header)
+        for stage in STAGES:
+            _row(ss, stage, stages[stage])
+        ss.write("\nIssued to first seen\n" + header)
+        for alert_class, histogram in sorted(seen_latency.items()):
+            _row(ss, alert_class, histogram)
+        ss.write("\nIssued to delivered\n" + header)
+        for alert_class, histogram in sorted(delivered_latency.items()):
+            _row(ss, alert_class, histogram)
+        return ss.getvalue()
+
+
+def clear() -> None:
+    stages.clear()
+    seen_latency.clear()
+    delivered_latency.clear()
+    _pending.clear()
@@ -23,12 +23,19 @@ from discord.ext import tasks, commands
 from . import aio_nws as nws
 from . import server_vars
 from . import global_vars
+from . import alert_diff
+from . import seen_alerts
+from . import metrics
+from .routing import SubscriptionIndex
+from .scheduler import AdaptiveInterval
+from .delivery import delivery, Message
 from .enums import *
 from .uptime import process_uptime_human_readable
 from .dir_calc import get_dir
 from io import StringIO, BytesIO, BufferedIOBase
 from pandas import DataFrame, concat
-from typing import Dict, List, Any, Optional
+from typing import Dict, Iterable, List, Any, NamedTuple, Optional, Set, Tuple
+from collections import defaultdict, OrderedDict
 from sys import exit
 from markdownify import markdownify as md
 from markdownify import MarkdownConverter
@@ -37,6 +44,12 @@ here = pathlib.Path(__file__).parent.resolve()
 TEST_ALERTS = json.loads((here / "test_alerts.json").read_text())
 TESTS_ENABLED = False  # When True, test alerts will trigger bulletins.
 NaN = float("nan")
+# Cancellations are polled incrementally from the newest `sent` time seen.
+# Re-request a little before it to catch late arrivals.
+CANCEL_OVERLAP = datetime.timedelta(minutes=5)
+CANCEL_LOOKBACK = datetime.timedelta(hours=1)
+# Rendered alert messages are shared by every guild they are sent to.
+RENDER_CACHE_SIZE = 512
 bot = discord.Bot(
     intents=discord.Intents.default(),
     default_command_integration_types={
@@ -186,10 +199,34 @@ async def on_application_command_error(
             _log.exception("Failed to send response.")
 
 
+def _initial_cancel_watermark() -> datetime.datetime:
+    """
+    Start from the newest cancellation that was persisted on the last run,
+    or from CANCEL_LOOKBACK ago if there is none.
+    """
+    now = datetime.datetime.now(datetime.timezone.utc)
+    seen_alerts.load()  # in case the old state still needs migrating
+    latest = seen_alerts.latest_cancel()
+    if latest is not None:
+        latest = datetime.datetime.fromtimestamp(latest, datetime.timezone.utc)
+        return max(latest, now - CANCEL_LOOKBACK)
+    return now - CANCEL_LOOKBACK
+
+
 class NWSMonitor(commands.Cog):
     def __init__(self, bot: discord.Bot):
         self.bot = bot
+        self.cancel_watermark: Optional[datetime.datetime] = None
+        self.seen_cancel_ids: Dict[str, datetime.datetime] = {}
+        self.subscriptions = SubscriptionIndex()
+        # The alerts from the last poll, for /resend_alert.
+        self.alerts_list: Optional[DataFrame] = None
+        self.alert_interval = AdaptiveInterval()
+        self.background_tasks: Set[asyncio.Task] = set()
         _log.info("Starting monitor...")
+        nws.open_sessions()
+        nws.gazetteer.load()
+        delivery.start(bot)
         self.update_alerts.start()
         self.update_spc_feeds.start()
 
@@ -197,158 +234,203 @@ class NWSMonitor(commands.Cog):
         _log.info("Stopping monitor...")
         self.update_alerts.cancel()
         self.update_spc_feeds.cancel()
+        delivery.stop()
+        self.bot.loop.create_task(nws.close_sessions())
+
+    def classify_and_route(
+        self, fresh: List[nws.Alert], testing: bool = False
+    ) -> List[Tuple[nws.Alert, "AlertClass", Set[int]]]:
+        """The alerts worth sending, with their class and the guilds to send to."""
+        self.subscriptions.refresh(guild.id for guild in self.bot.guilds)
+        nws.vtec.tracker.prune()
+        routed = []
+        for alert in fresh:
+            if not testing and not nws.vtec.tracker.observe(
+                alert.id, alert.vtecs, alert.sent_time
+            ):
+                _log.debug(f"Alert {alert.id} only re-ends ended events.")
+                continue
+            alert_class = classify_alert(alert)
+            if not alert_class.known_wfo:
+                _log.warning(
+                    f"Unknown WFO {alert.sender_name} in alert {alert.id}. "
+                    "Ignoring this alert."
+                )
+            if alert.event == AlertType.TEST.value or not (
+                alert_class.civ or alert_class.known_wfo
+            ):
+                continue
+            if alert_class.test and not TESTS_ENABLED:
+                continue
+            guild_ids = self.subscriptions.route(alert.event, alert.sender_name)
+            if not guild_ids:
+                continue
+            if not testing:
+                sent = alert.sent_time.timestamp() if alert.sent_time else None
+                metrics.alert_seen(alert.id, sent, alert_class.category)
+            routed.append((alert, alert_class, guild_ids))
+        return routed
+
+    async def send_emergency(
+        self, alert: nws.Alert, alert_class: "AlertClass", guild_ids: Set[int]
+    ):
+        """Send an emergency to bulletin and alert channels on the urgent lane."""
+        messages = await send_emergency_bulletins(
+            alert, alert_class, self.subscriptions.bulletin_channels.values()
+        )
+        message, text = render_alert(alert)
+        for guild_id in guild_ids:
+            channel_id = self.subscriptions.channels.get(guild_id)
+            if channel_id is not None:
+                messages.append(
+                    delivery.enqueue(
+                        channel_id,
+                        message,
+                        [("alert0.txt", text)],
+                        urgent=True,
+                        alert_id=alert.id,
+                    )
+                )
+        task = asyncio.create_task(_report_emergency_latency(alert, messages))
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+
+    def reschedule_alerts(self, interval: float):
+        if interval != self.update_alerts.seconds:
+            _log.debug(f"Polling alerts every {interval:.0f} seconds")
+            self.update_alerts.change_interval(seconds=interval)
+
+    async def poll_cancellations(self) -> DataFrame:
+        """
+        Fetch cancellations sent since the high-water mark, minus those that
+        were already seen. They count as seen once `commit_cancellations` is
+        called, after the tick that handles them has been saved.
+        """
+        if self.cancel_watermark is None:
+            self.cancel_watermark = _initial_cancel_watermark()
+            # Carry the overlap window's dedupe over from the last run.
+            self.seen_cancel_ids = {
+                i: datetime.datetime.fromtimestamp(sent, datetime.timezone.utc)
+                for i, sent in seen_alerts.cancels().items()
+                if sent is not None
+            }
+        start = self.cancel_watermark - CANCEL_OVERLAP
+        # `start` moves with the watermark, so caching would only pile up
+        # responses that are never asked for again.
+        cancelled_alerts, _ = await nws.poll_alerts(
+            active=False, message_type="cancel", start=start, use_cache=False
+        )
+        # Forget IDs that have fallen out of the overlap window.
+        self.seen_cancel_ids = {
+            i: sent for i, sent in self.seen_cancel_ids.items() if sent >= start
+        }
+        if cancelled_alerts.empty:
+            return cancelled_alerts
+        is_new = ~cancelled_alerts["id"].isin(self.seen_cancel_ids)
+        return cancelled_alerts[is_new]
+
+    def commit_cancellations(self, cancelled_alerts: DataFrame) -> None:
+        """Advance the high-water mark past cancellations that were handled."""
+        if cancelled_alerts.empty:
+            return
+        sent_times = cancelled_alerts["sent"].map(datetime.datetime.fromisoformat)
+        for i, sent in zip(cancelled_alerts["id"], sent_times):
+            self.seen_cancel_ids[i] = sent
+        self.cancel_watermark = max(self.cancel_watermark, sent_times.max())
 
     @tasks.loop(minutes=1)
     async def update_alerts(self, test_id: Optional[str] = None):
         if test_id is None:
-            is_test = False
-            prev_alerts_list = global_vars.get("prev_alerts_list")
-            alerts_list = await nws.alerts()
-            cancelled_alerts = await nws.alerts(active=False, message_type="cancel")
+            with metrics.span("fetch"), nws.priority(nws.Priority.CRITICAL):
+                alerts_list, active_changed = await nws.poll_alerts(hedge=True)
+                cancelled_alerts = await self.poll_cancellations()
+            self.reschedule_alerts(
+                self.alert_interval.after_poll(
+                    alerts_list, active_changed or not cancelled_alerts.empty
+                )
+            )
+            if not (active_changed or len(cancelled_alerts)):
+                _log.debug("Alerts have not changed since the last poll.")
+                return
+            prev_fingerprints = seen_alerts.load()
             alerts_list = concat((alerts_list, cancelled_alerts))
+            self.alerts_list = alerts_list
         else:
-            is_test = True
-            prev_alerts_list = {}
-            alerts_list = TEST_ALERTS[test_id]
-        new_alerts = []
-        e_ids = set()
-        e_text_dict = {}
-        if prev_alerts_list is None and test_id is None:
-            async with aiofiles.open("alerts_.txt", "w") as fp:
-                await _write_alerts_list(fp, alerts_list)
+            prev_fingerprints = {}
+            alerts_list = DataFrame(TEST_ALERTS[test_id])
+        with metrics.span("diff"):
+            fingerprints = alert_diff.fingerprints(alerts_list)
+            changes = alert_diff.diff(prev_fingerprints or {}, fingerprints)
+        if prev_fingerprints is None and test_id is None:
+            with metrics.span("build"):
+                fresh = nws.Alert.from_frame(alerts_list)
+            for alert in fresh:
+                nws.vtec.tracker.observe(alert.id, alert.vtecs, alert.sent_time)
+            summary = alerts_list_text(fresh).encode("utf-8")
             for guild in self.bot.guilds:
                 channel_id = server_vars.get("monitor_channel", guild.id)
                 if channel_id is not None:
                     await send_alerts(
-                        guild.id, channel_id, alert_count=len(alerts_list)
+                        guild.id,
+                        channel_id,
+                        alert_count=len(alerts_list),
+                        summary=summary,
                     )
         else:
-            if test_id is None:
-                prev_alerts_list = DataFrame(prev_alerts_list)
-                prev_ids_array = prev_alerts_list["id"].array
-            else:
-                prev_ids_array = []
-            for guild in self.bot.guilds:
-                new_alerts = []
-                emergencies = []
-                excluded_alerts = server_vars.get("exclude_alerts", guild.id)
-                excluded_wfos = server_vars.get("exclude_wfos", guild.id)
-                wfo_list = server_vars.get("wfo_list", guild.id)
-                if excluded_alerts is None:
-                    excluded_alerts = []
-                if excluded_wfos is None:
-                    excluded_wfos = []
-                for i, ad, se, o, en, mt, ev, sn, hl, d, ins, p, ex, st in zip(
-                    alerts_list["id"],
-                    alerts_list["areaDesc"],
-                    alerts_list["sent"],
-                    alerts_list["onset"],
-                    alerts_list["ends"],
-                    alerts_list["messageType"],
-                    alerts_list["event"],
-                    alerts_list["senderName"],
-                    alerts_list["headline"],
-                    alerts_list["description"],
-                    alerts_list["instruction"],
-                    alerts_list["parameters"],
-                    alerts_list["expires"],
-                    alerts_list["status"],
-                ):
-                    if (
-                        i not in prev_ids_array
-                        and not (
-                            sn in excluded_wfos
-                            or ev in excluded_alerts
-                            or ev == AlertType.TEST.value
-                        )
-                        and (is_civ(p) or sn in WFO)
-                        and ((not wfo_list) or sn in wfo_list)
-                    ):
-                        entry = {
-                            "id": i,
-                            "areaDesc": ad,
-                            "sent": se,
-                            "onset": o,
-                            "ends": en,
-                            "messageType": mt,
-                            "event": ev,
-                            "senderName": sn,
-                            "headline": hl,
-                            "description": d,
-                            "instruction": ins,
-                            "parameters": p,
-                            "expires": ex,
-                            "status": st,
-                        }
-                        is_test = st != "Actual"
-                        if is_test and not TESTS_ENABLED:
-                            continue
-                        if is_emergency(p, ev):
-                            emergencies.append(entry)
-                            if i not in e_ids:
-                                if i not in e_text_dict:
-                                    e_text_dict[i] = get_alert_text(**entry)
-                                    e_text = e_text_dict[i]
-                                    async with aiofiles.open("bulletin.txt", "w") as f:
-                                        await f.write(e_text)
-                                with open("bulletin.txt", "rb") as fp:
-                                    if is_tore(p):
-                                        await send_bulletin(
-                                            f"**TORNADO EMERGENCY** for {ad}! \
-If you are in the affected area, take immediate tornado precautions!",
-                                            fp,
-                                            True,
-                                            is_test,
-                                        )
-                                    if is_ffwe(p):
-                                        await send_bulletin(
-                                            f"**FLASH FLOOD EMERGENCY** for {ad}! \
-If you are in the affected area, seek higher ground now!",
-                                            fp,
-                                            True,
-                                            is_test,
-                                        )
-                                    if (
-                                        ev == AlertType.TSW.value
-                                        and get_alert_status(p, mt)
-                                        != ValidTimeEventCodeVerb.CAN.value
-                                    ):
-                                        await send_bulletin(
-                                            f"A **TSUNAMI WARNING** is in \
-effect for {ad}! If you are in the affected area, get away from the coast! \
-Move inland, seek higher ground, and stay away from the coast until it is \
-deemed safe by local officials.",
-                                            fp,
-                                            True,
-                                            is_test,
-                                        )
-                                e_ids.add(i)
-                        elif is_pds(**entry) or is_eds(**entry):
-                            emergencies.append(entry)
-                        else:
-                            new_alerts.append(entry)
-                    if not (sn in WFO or i in prev_ids_array):
-                        _log.warning(
-                            f"Unknown WFO {sn} in alert {i}. Ignoring this alert."
-                        )
-                new_alerts = DataFrame(new_alerts)
-                emergencies = DataFrame(emergencies)
-                _log.debug(f"New alerts: {new_alerts}")
-                _log.debug(f"New emergencies: {emergencies}")
-                channel_id = server_vars.get("monitor_channel", guild.id)
-                if channel_id is not None:
-                    # avoid rate limiting
-                    if len(new_alerts) > 5:
-                        async with aiofiles.open("alerts_.txt", "w") as fp:
-                            await _write_alerts_list(fp, new_alerts)
-                        await send_alerts(
-                            guild.id, channel_id, alert_count=len(new_alerts)
-                        )
-                    else:
-                        await send_alerts(guild.id, channel_id, new_alerts)
-                    await send_alerts(guild.id, channel_id, emergencies)
+            _log.debug(
+                f"Alerts: {len(changes.added)} new, {len(changes.updated)} updated, "
+                f"{len(changes.removed)} removed"
+            )
+            with metrics.span("build"):
+                fresh = nws.Alert.from_frame(
+                    alerts_list[alerts_list["id"].isin(changes.fresh)]
+                )
+                for alert in fresh:
+                    alert.version = fingerprints[alert.id]
+            with metrics.span("classify"):
+                routed = self.classify_and_route(fresh, test_id is not None)
+            # Life-safety alerts go out ahead of all routine traffic.
+            for alert, alert_class, guild_ids in routed:
+                if alert_class.emergency:
+                    await self.send_emergency(alert, alert_class, guild_ids)
+            new_alerts = defaultdict(list)
+            emergencies = defaultdict(list)
+            for alert, alert_class, guild_ids in routed:
+                if alert_class.emergency:
+                    continue
+                if alert_class.dangerous:
+                    for guild_id in guild_ids:
+                        emergencies[guild_id].append(alert)
+                else:
+                    for guild_id in guild_ids:
+                        new_alerts[guild_id].append(alert)
+            for guild_id in new_alerts.keys() | emergencies.keys():
+                channel_id = self.subscriptions.channels.get(guild_id)
+                if channel_id is None:
+                    continue
+                guild_alerts = new_alerts[guild_id]
+                guild_emergencies = emergencies[guild_id]
+                _log.debug(f"New alerts: {guild_alerts}")
+                _log.debug(f"New emergencies: {guild_emergencies}")
+                # avoid rate limiting
+                if len(guild_alerts) > 5:
+                    await send_alerts(
+                        guild_id,
+                        channel_id,
+                        alert_count=len(guild_alerts),
+                        summary=alerts_list_text(guild_alerts).encode("utf-8"),
+                    )
+                else:
+                    await send_alerts(guild_id, channel_id, guild_alerts)
+                await send_alerts(guild_id, channel_id, guild_emergencies)
         if test_id is None:
-            global_vars.write("prev_alerts_list", alerts_list.to_dict("list"))
+            # Keep cancellations for as long as they can be polled again.
+            oldest = datetime.datetime.now(datetime.timezone.utc) - (
+                CANCEL_LOOKBACK + CANCEL_OVERLAP
+            )
+            seen_alerts.prune_cancels(oldest.timestamp())
+            seen_alerts.update(fresh, fingerprints, changes.removed)
+            self.commit_cancellations(cancelled_alerts)
 
     @update_alerts.error
     async def on_update_alerts_error(self, error: Exception):
@@ -356,14 +438,23 @@ deemed safe by local officials.",
             "An error occurred while getting or sending alerts.",
             exc_info=(type(error), error, error.__traceback__),
         )
+        interval = self.alert_interval.after_failure()
+        self.reschedule_alerts(interval)
+        if isinstance(error, nws.CircuitOpenError):
+            await _wait_for_circuit(error)
+        else:
+            # restart() polls again right away, so back off here.
+            _log.info(f"Waiting {interval:.0f} seconds before polling again.")
+            await asyncio.sleep(interval)
         self.update_alerts.restart()
 
     @tasks.loop(minutes=1)
     async def update_spc_feeds(self):
         prev_spc_feed = global_vars.get("prev_spc_feed")
         prev_wpc_feed = global_vars.get("prev_wpc_feed")
-        spc_feed = await nws.spc.fetch_spc_feed()
-        wpc_feed = await nws.spc.fetch_wpc_feed()
+        with nws.priority(nws.Priority.BACKGROUND):
+            spc_feed = await nws.spc.fetch_spc_feed()
+            wpc_feed = await nws.spc.fetch_wpc_feed()
         if prev_spc_feed is None or prev_wpc_feed is None:
             global_vars.write("prev_spc_feed", spc_feed.to_dict("list"))
             global_vars.write("prev_wpc_feed", wpc_feed.to_dict("list"))
@@ -442,16 +533,23 @@ deemed safe by local officials.",
             "An exception occurred while getting or sending articles.",
             exc_info=(type(error), error, error.__traceback__),
         )
+        await _wait_for_circuit(error)
         self.update_spc_feeds.restart()
 
 
-def get_alert_status(params: dict, m_type: str) -> str:
-    try:
-        vtec = params["VTEC"][0].strip("/").split(".")
-    except (KeyError, AttributeError, TypeError):
-        vtec = None
-    if vtec is not None:
-        m_verb = ValidTimeEventCodeVerb[vtec[1]].value
+async def _wait_for_circuit(error: Exception):
+    """Don't restart a loop while the upstream host's circuit is open."""
+    if isinstance(error, nws.CircuitOpenError):
+        delay = max(error.retry_after, 1)
+        _log.info(f"Waiting {delay:.0f} seconds before polling again.")
+        await asyncio.sleep(delay)
+
+
+def get_alert_status(alert: nws.Alert) -> str:
+    m_type = alert.message_type
+    if alert.vtec is not None:
+        verb = ValidTimeEventCodeVerb.__members__.get(alert.vtec.action)
+        m_verb = (verb or ValidTimeEventCodeVerb.default).value
     else:
         if m_type == "Alert":
             m_verb = ValidTimeEventCodeVerb.NEW.value
@@ -462,16 +560,9 @@ def get_alert_status(params: dict, m_type: str) -> str:
     return m_verb
 
 
-def is_pds(text: Optional[str] = None, **kwargs) -> bool:
-    if not text:
-        text = get_alert_text(**kwargs)
-    return "PARTICULARLY DANGEROUS SITUATION" in text.upper()
-
-
-def is_eds(text: Optional[str] = None, **kwargs) -> bool:
-    if not text:
-        text = get_alert_text(**kwargs)
-    return "EXTREMELY DANGEROUS SITUATION" in text.upper()
+def is_dangerous(alert: nws.Alert) -> bool:
+    """Whether the alert is a PDS or EDS."""
+    return "pds" in alert.tags or "eds" in alert.tags
 
 
 def is_tore(params: dict):
@@ -493,18 +584,109 @@ def is_emergency(params: dict, alert_type: Optional[str] = None):
     )
 
 
-async def _write_alerts_list(fp: aiofiles.threadpool.AsyncTextIOWrapper, al: DataFrame):
-    for head, params, desc, inst in zip(
-        al["headline"],
-        al["parameters"],
-        al["description"],
-        al["instruction"],
-    ):
-        await fp.write(f"{head}\n\n")
-        await fp.write(
-            get_alert_text(parameters=params, description=desc, instruction=inst)
-        )
-        await fp.write("\n\n$$\n\n")
+class AlertClass(NamedTuple):
+    known_wfo: bool
+    civ: bool
+    test: bool
+    emergency: bool
+    tore: bool
+    ffwe: bool
+    dangerous: bool  # PDS or EDS
+
+    @property
+    def category(self) -> str:
+        """A coarse class for latency reporting."""
+        if self.emergency:
+            return "emergency"
+        return "dangerous" if self.dangerous else "routine"
+
+
+def alert_text(alert: nws.Alert) -> str:
+    return get_alert_text(
+        parameters=alert.parameters,
+        description=alert.description,
+        instruction=alert.instruction,
+    )
+
+
+def classify_alert(alert: nws.Alert) -> AlertClass:
+    """Work out everything routing needs to know about an alert, once."""
+    return AlertClass(
+        known_wfo=alert.sender_name in WFO,
+        civ=is_civ(alert.parameters),
+        test=alert.status != "Actual",
+        emergency=is_emergency(alert.parameters, alert.event),
+        tore=is_tore(alert.parameters),
+        ffwe=is_ffwe(alert.parameters),
+        dangerous=is_dangerous(alert),
+    )
+
+
+async def _report_emergency_latency(alert: nws.Alert, messages: List[Message]):
+    sent = await delivery.wait(messages)
+    if alert.sent_time is None or alert.is_test or not any(sent):
+        return
+    latency = time.time() - alert.sent_time.timestamp()
+    delivery.stats.record_emergency(latency)
+    _log.info(
+        f"Emergency {alert.id} reached {sum(sent)} of {len(messages)} channel(s) "
+        f"{latency:.1f} s after it was issued"
+    )
+
+
+async def send_emergency_bulletins(
+    alert: nws.Alert, alert_class: AlertClass, channels: Iterable[int]
+) -> List[Message]:
+    areas = alert.area_desc
+    channels = list(channels)
+    messages = []
+    with BytesIO(alert_text(alert).encode("utf-8")) as fp:
+        fp.name = "bulletin.txt"
+        if alert_class.tore:
+            messages += await send_bulletin(
+                f"**TORNADO EMERGENCY** for {areas}! \
+If you are in the affected area, take immediate tornado precautions!",
+                fp,
+                True,
+                alert_class.test,
+                channels,
+                urgent=True,
+            )
+        if alert_class.ffwe:
+            messages += await send_bulletin(
+                f"**FLASH FLOOD EMERGENCY** for {areas}! \
+If you are in the affected area, seek higher ground now!",
+                fp,
+                True,
+                alert_class.test,
+                channels,
+                urgent=True,
+            )
+        if (
+            alert.event == AlertType.TSW.value
+            and get_alert_status(alert) != ValidTimeEventCodeVerb.CAN.value
+        ):
+            messages += await send_bulletin(
+                f"A **TSUNAMI WARNING** is in \
+effect for {areas}! If you are in the affected area, get away from the coast! \
+Move inland, seek higher ground, and stay away from the coast until it is \
+deemed safe by local officials.",
+                fp,
+                True,
+                alert_class.test,
+                channels,
+                urgent=True,
+            )
+    return messages
+
+
+def alerts_list_text(alerts: List[nws.Alert]) -> str:
+    with StringIO() as ss:
+        for alert in alerts:
+            ss.write(f"{alert.headline}\n\n")
+            ss.write(alert_text(alert))
+            ss.write("\n\n$$\n\n")
+        return ss.getvalue()
 
 
 def is_not_in_effect(verb: str) -> bool:
@@ -515,224 +697,174 @@ def is_not_in_effect(verb: str) -> bool:
     )
 
 
+_render_cache: "OrderedDict[Tuple[str, str], Tuple[str, bytes]]" = OrderedDict()
+
+
+def render_alert(alert: nws.Alert) -> Tuple[str, bytes]:
+    """
+    The message and attachment for an alert. Alerts with a version are
+    rendered once and reused for every guild.
+    """
+    with metrics.span("render"):
+        key = (alert.id, alert.version)
+        if alert.version is not None:
+            try:
+                _render_cache.move_to_end(key)
+                return _render_cache[key]
+            except KeyError:
+                pass
+        rendered = _render_alert(alert)
+        if alert.version is not None:
+            _render_cache[key] = rendered
+            if len(_render_cache) > RENDER_CACHE_SIZE:
+                _render_cache.popitem(last=False)
+        return rendered
+
+
+def _render_alert(alert: nws.Alert) -> Tuple[str, bytes]:
+    params = alert.parameters
+    event = alert.event
+    areas = alert.area_desc
+    m_verb = get_alert_status(alert)
+    text = alert_text(alert)
+
+    if event == AlertType.TOR.value and alert.tor_damage_threat == "CONSIDERABLE":
+        event = SpecialAlert.PDS_TOR.value
+    elif event == AlertType.TOR.value and is_tore(params):
+        event = SpecialAlert.TOR_E.value
+    elif event == AlertType.FFW.value and is_ffwe(params):
+        event = SpecialAlert.FFW_E.value
+    elif event == AlertType.SVR.value:
+        if "eds" in alert.tags:
+            event = SpecialAlert.PDS_SVR.value
+        elif alert.tstm_damage_threat == "DESTRUCTIVE":
+            event = SpecialAlert.SVR_DESTRUCTIVE.value
+    elif "pds" in alert.tags:
+        match event:
+            case AlertType.BZW.value:
+                event = SpecialAlert.PDS_BZW.value
+            case AlertType.ICE.value:
+                event = SpecialAlert.PDS_ICE.value
+            case AlertType.RFW.value:
+                event = SpecialAlert.PDS_RFW.value
+            case AlertType.TOA.value:
+                event = SpecialAlert.PDS_TOA.value
+            case AlertType.SVA.value:
+                event = SpecialAlert.PDS_SVA.value
+            case _:
+                pass
+
+    is_test = alert.is_test
+
+    emoji = DEFAULT_EMOJI.get(event, ":warning:")
+
+    with StringIO() as ss:
+        if is_test:
+            ss.write("**THIS IS ONLY A TEST**\n")
+        ss.write(f"{alert.sender_name} {m_verb} ")
+        if not is_not_in_effect(m_verb):
+            ss.write(f"{emoji} ")
+        ss.write(f"{event} ")
+        if (
+            alert.tornado is not None
+            or alert.max_wind is not None
+            or alert.max_hail is not None
+            or alert.flash_flood is not None
+            or alert.ff_damage_threat is not None
+            or alert.tstm_damage_threat is not None
+            or alert.snow_squall is not None
+        ):
+            ss.write("(")
+            if alert.tornado is not None:
+                ss.write(f"tornado: {alert.tornado}, ")
+            if alert.tor_damage_threat is not None:
+                ss.write(f"damage threat: {alert.tor_damage_threat}, ")
+            if alert.tstm_damage_threat is not None:
+                ss.write(f"damage threat: {alert.tstm_damage_threat}, ")
+            if alert.flash_flood is not None:
+                ss.write(f"flash flood: {alert.flash_flood}, ")
+            if alert.ff_damage_threat is not None:
+                ss.write(f"damage threat: {alert.ff_damage_threat}, ")
+            if alert.max_wind is not None:
+                ss.write(f"wind: {alert.max_wind}")
+                if alert.wind_threat is not None:
+                    ss.write(f" ({alert.wind_threat})")
+                ss.write(", ")
+            if alert.max_hail is not None:
+                ss.write(f'hail: {alert.max_hail}"')
+                if alert.hail_threat is not None:
+                    ss.write(f" ({alert.hail_threat})")
+                ss.write(", ")
+            if alert.snow_squall is not None:
+                ss.write(f"snow squall: {alert.snow_squall}, ")
+            if alert.snow_squall_impact is not None:
+                ss.write(f"impact: {alert.snow_squall_impact}, ")
+            ss.seek(ss.tell() - 2)  # go back 2 characters
+            ss.write(") ")
+        if alert.onset_time is not None and alert.sent != alert.onset:
+            onset = int(alert.onset_time.timestamp())
+            ss.write(f"valid <t:{onset}:f> ")
+        if (
+            m_verb == ValidTimeEventCodeVerb.EXA.value
+            or m_verb == ValidTimeEventCodeVerb.EXB.value
+        ):
+            ss.write(f"to include {areas} ")
+        else:
+            ss.write(f"for {areas} ")
+        if not (
+            is_not_in_effect(m_verb)
+            or event in STR_ALERTS_WITH_NO_END_TIME
+            or not (event in AlertType or event in SpecialAlert)
+        ):
+            if alert.ends_time is not None:
+                end = int(alert.ends_time.timestamp())
+                ss.write(f"until <t:{end}:f>.")
+            elif (
+                event == AlertType.SPS.value
+                or event == AlertType.MWS.value
+                or event == AlertType.AQA.value
+            ):
+                exp = int(alert.expires_time.timestamp())
+                ss.write(f"until <t:{exp}:f>.")
+            else:
+                ss.write(f"until further notice.")
+        ss.seek(ss.tell() - 1)
+        ss.write(".")
+        if is_test:
+            ss.write("\n**THIS IS ONLY A TEST. NO ACTION IS REQUIRED.**")
+        message = ss.getvalue()
+    if len(message) > 2000:
+        message = f"NWSMonitor tried to send a message that was too long. \
+Here's a shortened version:\n{alert.headline}"
+    return message, text.encode("utf-8")
+
+
 async def send_alerts(
     guild_id: int,
     to_channel: int,
-    alerts: Optional[DataFrame] = None,
+    alerts: Optional[List[nws.Alert]] = None,
     alert_count: Optional[int] = 0,
+    summary: Optional[bytes] = None,
 ):
     _log.info(f"Sending alerts to guild {guild_id}...")
     channel = bot.get_channel(to_channel)
     if channel is None:
         return
     if alerts is None:
-        with open("alerts_.txt", "rb") as fp:
-            await channel.send(
-                f"{alert_count} alerts were issued or updated.",
-                file=discord.File(fp, "alerts.txt"),
-            )
+        delivery.enqueue(
+            to_channel,
+            f"{alert_count} alerts were issued or updated.",
+            [("alerts.txt", summary)],
+        )
     else:
-        for i, alert in enumerate(alerts.to_numpy()):
-            desc = alert[9]
-            inst = alert[10]
-            params = alert[11]
-            sender_name = alert[7]
-            m_type = alert[5]
-            event = alert[6]
-            sent = alert[2]
-            onset = alert[3]
-            areas = alert[1]
-            exp = alert[12]
-            end = alert[4]
-            head = alert[8]
-            status = alert[13]
-            _log.debug(f"{desc=}")
-            _log.debug(f"{inst=}")
-            if event == AlertType.TEST.value:
+        for i, alert in enumerate(alerts):
+            if alert.event == AlertType.TEST.value:
                 continue
-
-            if not isinstance(params, dict):
-                _log.warning("Found malformed alert parameters.")
-
-            m_verb = get_alert_status(params, m_type)
-            alert_text = get_alert_text(
-                parameters=params, description=desc, instruction=inst
+            message, text = render_alert(alert)
+            delivery.enqueue(
+                to_channel, message, [(f"alert{i}.txt", text)], alert_id=alert.id
             )
 
-            try:
-                tornado = params["tornadoDetection"][0]
-            except (KeyError, TypeError):
-                tornado = None
-            try:
-                tor_damage_threat = params["tornadoDamageThreat"][0]
-            except (KeyError, TypeError):
-                tor_damage_threat = None
-            try:
-                wind_threat = params["windThreat"][0]
-            except (KeyError, TypeError):
-                wind_threat = None
-            try:
-                max_wind = params["maxWindGust"][0]
-            except (KeyError, TypeError):
-                max_wind = None
-            try:
-                hail_threat = params["hailThreat"][0]
-            except (KeyError, TypeError):
-                hail_threat = None
-            try:
-                max_hail = params["maxHailSize"][0]
-            except (KeyError, TypeError):
-                max_hail = None
-            try:
-                tstm_damage_threat = params["thunderstormDamageThreat"][0]
-            except (KeyError, TypeError):
-                tstm_damage_threat = None
-            try:
-                flash_flood = params["flashFloodDetection"][0]
-            except (KeyError, TypeError):
-                flash_flood = None
-            try:
-                ff_damage_threat = params["flashFloodDamageThreat"][0]
-            except (KeyError, TypeError):
-                ff_damage_threat = None
-            try:
-                snow_squall = params["snowSquallDetection"][0]
-            except (KeyError, TypeError):
-                snow_squall = None
-            try:
-                snow_squall_impact = params["snowSquallImpact"][0]
-            except (KeyError, TypeError):
-                snow_squall_impact = None
-
-            if event == AlertType.TOR.value and tor_damage_threat == "CONSIDERABLE":
-                event = SpecialAlert.PDS_TOR.value
-            elif event == AlertType.TOR.value and is_tore(params):
-                event = SpecialAlert.TOR_E.value
-            elif event == AlertType.FFW.value and is_ffwe(params):
-                event = SpecialAlert.FFW_E.value
-            elif event == AlertType.SVR.value:
-                if is_eds(alert_text):
-                    event = SpecialAlert.PDS_SVR.value
-                elif tstm_damage_threat == "DESTRUCTIVE":
-                    event = SpecialAlert.SVR_DESTRUCTIVE.value
-            elif is_pds(alert_text):
-                match event:
-                    case AlertType.BZW.value:
-                        event = SpecialAlert.PDS_BZW.value
-                    case AlertType.ICE.value:
-                        event = SpecialAlert.PDS_ICE.value
-                    case AlertType.RFW.value:
-                        event = SpecialAlert.PDS_RFW.value
-                    case AlertType.TOA.value:
-                        event = SpecialAlert.PDS_TOA.value
-                    case AlertType.SVA.value:
-                        event = SpecialAlert.PDS_SVA.value
-                    case _:
-                        pass
-
-            # "isTest" IS NOT AN OFFICIAL PARAMETER
-            if isinstance(params, dict):
-                is_test = params.get("isTest", False)
-            else:
-                is_test = False
-
-            if not is_test:
-                is_test = status != "Actual"
-
-            emoji = DEFAULT_EMOJI.get(event, ":warning:")
-
-            with StringIO() as ss:
-                if is_test:
-                    ss.write("**THIS IS ONLY A TEST**\n")
-                ss.write(f"{sender_name} {m_verb} ")
-                if not is_not_in_effect(m_verb):
-                    ss.write(f"{emoji} ")
-                ss.write(f"{event} ")
-                if (
-                    tornado is not None
-                    or max_wind is not None
-                    or max_hail is not None
-                    or flash_flood is not None
-                    or ff_damage_threat is not None
-                    or tstm_damage_threat is not None
-                    or snow_squall is not None
-                ):
-                    ss.write("(")
-                    if tornado is not None:
-                        ss.write(f"tornado: {tornado}, ")
-                    if tor_damage_threat is not None:
-                        ss.write(f"damage threat: {tor_damage_threat}, ")
-                    if tstm_damage_threat is not None:
-                        ss.write(f"damage threat: {tstm_damage_threat}, ")
-                    if flash_flood is not None:
-                        ss.write(f"flash flood: {flash_flood}, ")
-                    if ff_damage_threat is not None:
-                        ss.write(f"damage threat: {ff_damage_threat}, ")
-                    if max_wind is not None:
-                        ss.write(f"wind: {max_wind}")
-                        if wind_threat is not None:
-                            ss.write(f" ({wind_threat})")
-                        ss.write(", ")
-                    if max_hail is not None:
-                        ss.write(f'hail: {max_hail}"')
-                        if hail_threat is not None:
-                            ss.write(f" ({hail_threat})")
-                        ss.write(", ")
-                    if snow_squall is not None:
-                        ss.write(f"snow squall: {snow_squall}, ")
-                    if snow_squall_impact is not None:
-                        ss.write(f"impact: {snow_squall_impact}, ")
-                    ss.seek(ss.tell() - 2)  # go back 2 characters
-                    ss.write(") ")
-                if sent != onset and onset is not None:
-                    onset = int(datetime.datetime.fromisoformat(onset).timestamp())
-                    ss.write(f"valid <t:{onset}:f> ")
-                if (
-                    m_verb == ValidTimeEventCodeVerb.EXA.value
-                    or m_verb == ValidTimeEventCodeVerb.EXB.value
-                ):
-                    ss.write(f"to include {areas} ")
-                else:
-                    ss.write(f"for {areas} ")
-                if not (
-                    is_not_in_effect(m_verb)
-                    or event in STR_ALERTS_WITH_NO_END_TIME
-                    or not (event in AlertType or event in SpecialAlert)
-                ):
-                    if end is not None:
-                        end = int(datetime.datetime.fromisoformat(end).timestamp())
-                        ss.write(f"until <t:{end}:f>.")
-                    elif (
-                        event == AlertType.SPS.value
-                        or event == AlertType.MWS.value
-                        or event == AlertType.AQA.value
-                    ):
-                        exp = int(datetime.datetime.fromisoformat(exp).timestamp())
-                        ss.write(f"until <t:{exp}:f>.")
-                    else:
-                        ss.write(f"until further notice.")
-                ss.seek(ss.tell() - 1)
-                ss.write(".")
-                if is_test:
-                    ss.write("\n**THIS IS ONLY A TEST. NO ACTION IS REQUIRED.**")
-                text = ss.getvalue()
-            try:
-                nws_head = params["NWSheadline"][0]
-            except KeyError:
-                nws_head = None
-            async with aiofiles.open(f"alert{i}.txt", "w") as b:
-                await b.write(alert_text)
-            # I don't know if discord.File supports aiofiles objects
-            with open(f"alert{i}.txt", "rb") as fp:
-                if len(text) > 2000:
-                    await channel.send(
-                        f"NWSMonitor tried to send a message that was too long. \
-Here's a shortened version:\n{head}",
-                        file=discord.File(fp),
-                    )
-                else:
-                    await channel.send(text, file=discord.File(fp))
-
 
 async def _write_article_list(
     fp: aiofiles.threadpool.AiofilesContextManager, al: DataFrame
@@ -752,10 +884,11 @@ async def send_articles(
     if channel is None:
         return
     if articles is None:
-        with open("articles.txt", "rb") as fp:
-            await channel.send(
+        async with aiofiles.open("articles.txt", "rb") as fp:
+            delivery.enqueue(
+                to_channel,
                 f"{article_count} articles were sent.",
-                file=discord.File(fp),
+                [("articles.txt", await fp.read())],
             )
     else:
         for i, article in enumerate(articles.to_numpy()):
@@ -763,17 +896,17 @@ async def send_articles(
             link = article[1]
             desc = article[2]
             date = article[3]
-            async with aiofiles.open(f"article{i}.txt", "w") as b:
-                await b.write(desc)
+            attachment = (f"article{i}.txt", desc.encode("utf-8"))
             text = f"{title}\n{link}"
-            with open(f"article{i}.txt", "rb") as fp:
-                if len(text) > 2000:
-                    await channel.send(
-                        f"NWSMonitor tried to send a message that was too long. \
+            if len(text) > 2000:
+                delivery.enqueue(
+                    to_channel,
+                    f"NWSMonitor tried to send a message that was too long. \
 Here's a shortened version:\n{link}",
-                        file=discord.File(fp),
-                    )
-                await channel.send(text, file=discord.File(fp))
+                    [attachment],
+                )
+            else:
+                delivery.enqueue(to_channel, text, [attachment])
 
 
 @bot.slash_command(name="ping", description="Pong!")
@@ -796,8 +929,10 @@ async def current_conditions(
     location: Option(str, description="Address; City, State; or ZIP code."),  # type: ignore
 ):
     await ctx.defer()
-    obs, _, real_loc = await nws.get_forecast(location)
-    alerts = await nws.alerts_for_location(location, status="actual")
+    (obs, _, real_loc), alerts = await asyncio.gather(
+        nws.get_forecast(location, include_forecast=False),
+        nws.alerts_for_location(location, status="actual"),
+    )
     station_id = obs["stationId"]
     station_name = obs["stationName"]
     obs_time = datetime.datetime.fromisoformat(obs["timestamp"])
@@ -907,8 +1042,10 @@ async def forecast(
     ) = "us",  # type: ignore
 ):
     await ctx.defer()
-    _, forecast, real_loc = await nws.get_forecast(location, units)
-    alerts = await nws.alerts_for_location(location, status="actual")
+    (_, forecast, real_loc), alerts = await asyncio.gather(
+        nws.get_forecast(location, units, include_observation=False),
+        nws.alerts_for_location(location, status="actual"),
+    )
     embed = discord.Embed(
         title=f"Forecast for {real_loc.address.removesuffix(', United States')}",
         thumbnail=forecast["icon"][0],
@@ -1077,24 +1214,15 @@ async def alerts(
             certainty=certainty,
         )
     _log.debug(f"{alerts_list=}")
+    alerts = nws.Alert.from_frame(alerts_list)
     if pds:
-        to_delete = set()
-        for i, params, desc, inst in zip(
-            alerts_list["id"],
-            alerts_list["parameters"],
-            alerts_list["description"],
-            alerts_list["instruction"],
-        ):
-            text = get_alert_text(parameters=params, description=desc, instruction=inst)
-            if not (is_pds(text) or is_eds(text)):
-                to_delete.add(i)
-        alerts_list = alerts_list.loc[~alerts_list["id"].isin(to_delete)]
-    if not alerts_list.empty:
-        async with aiofiles.open("alerts.txt", "w") as fp:
-            await _write_alerts_list(fp, alerts_list)
-        with open("alerts.txt", "rb") as fp:
+        alerts = [alert for alert in alerts if is_dangerous(alert)]
+    if alerts:
+        text = alerts_list_text(alerts)
+        with BytesIO(text.encode("utf-8")) as fp:
             await ctx.respond(
-                f"{len(alerts_list)} alert(s) found.", file=discord.File(fp)
+                f"{len(alerts)} alert(s) found.",
+                file=discord.File(fp, filename="alerts.txt"),
             )
     else:
         await ctx.respond("No alerts found with the given parameters.\n\
@@ -1360,12 +1488,93 @@ Give me permission to post in said channel, or use a different channel.")
 @commands.is_owner()
 async def purge(ctx: discord.ApplicationContext):
     await ctx.defer(ephemeral=True)
-    global_vars.write("prev_alerts_list", None)
+    seen_alerts.clear()
     global_vars.write("prev_spc_feed", None)
     global_vars.write("prev_wpc_feed", None)
+    nws.response_cache.clear()
+    nws.gridpoint_cache.clear()
+    nws.geocode.clear_cache()
+    nws.alert_index.clear()
+    nws.vtec.tracker.clear()
     await ctx.respond("Cleared cache.")
 
 
+@bot.slash_command(name="stats", description="Show upstream request statistics")
+@commands.is_owner()
+async def stats(ctx: discord.ApplicationContext):
+    await ctx.defer(ephemeral=True)
+    counters = nws.resilience.counters
+    cache = nws.response_cache
+    with StringIO() as ss:
+        ss.write("# Upstream requests\n")
+        ss.write(f"Retries: {counters['retries']}")
+        ss.write(f" (Retry-After honored: {counters['retry_after_honored']})\n")
+        ss.write(f"Circuit breaker trips: {counters['circuit_opened']}")
+        ss.write(f" (requests rejected: {counters['circuit_rejections']})\n")
+        ss.write(f"Hedged requests: {counters['hedges']}")
+        ss.write(f" (won by the hedge: {counters['hedge_wins']})\n")
+        for host, breaker in nws.resilience.breakers.items():
+            ss.write(f"{host}: {breaker.state}\n")
+        ss.write(
+            f"Response cache: {cache.hits} fresh, {cache.revalidations} unchanged, "
+            f"{cache.misses} downloaded ({len(cache)} cached)\n"
+        )
+        ss.write(f"Coalesced duplicate requests: {nws.in_flight.coalesced}\n")
+        gridpoints = nws.gridpoint_cache
+        ss.write(
+            f"Gridpoint cache: {gridpoints.hits} hits, {gridpoints.misses} misses "
+            f"({len(gridpoints)} cached)\n"
+        )
+        ss.write(
+            f"Alert index: {len(nws.alert_index)} alerts, "
+            f"{nws.alert_index.hits} local lookups, "
+            f"{nws.alert_index.fallbacks} API lookups\n"
+        )
+        monitor = bot.get_cog("NWSMonitor")
+        if monitor is not None:
+            ss.write(
+                f"Alert polling interval: {monitor.alert_interval.current:.0f} s\n"
+            )
+        ss.write(
+            f"VTEC events: {len(nws.vtec.tracker.events)} tracked, "
+            f"{nws.vtec.tracker.collapsed} redundant alerts skipped\n"
+        )
+        geocoding = nws.geocode.stats
+        ss.write(
+            f"Geocoding: {geocoding.gazetteer_hits} offline, "
+            f"{geocoding.requests} requests, "
+            f"{geocoding.mean_time:.2f} s mean, {geocoding.max_time:.2f} s max, "
+            f"{geocoding.timeouts} timed out, {geocoding.errors} failed "
+            f"(cache: {geocoding.cache_hits} hits, {geocoding.cache_misses} misses)\n"
+        )
+        stats = delivery.stats
+        ss.write(
+            f"Discord delivery: {delivery.depth} queued "
+            f"in {len(delivery.queues)} channel(s), {stats.sent} sent, "
+            f"{stats.failed} failed, {stats.dropped} dropped, "
+            f"latency {stats.mean_latency:.2f} s mean / {stats.max_latency:.2f} s max\n"
+        )
+        ss.write(
+            f"Emergencies: {stats.emergencies} delivered ({stats.urgent_sent} "
+            f"messages), issued-to-delivered {stats.last_emergency_latency:.1f} s "
+            f"last / {stats.max_emergency_latency:.1f} s max\n"
+        )
+        for host, limiter in nws.ratelimit.limiters.items():
+            ss.write(
+                f"{host}: {limiter.bulkhead.active} active, "
+                f"{limiter.bulkhead.queued} queued, "
+                f"{limiter.throttled} throttled\n"
+            )
+        await ctx.respond(ss.getvalue())
+
+
+@bot.slash_command(name="latency", description="Show alert pipeline latency")
+@commands.is_owner()
+async def latency(ctx: discord.ApplicationContext):
+    await ctx.defer(ephemeral=True)
+    await ctx.respond(f"```\n{metrics.report()}```")
+
+
 @settings.command(
     name="bulletin_channel", description="Set the channel for NWSMonitor announcements"
 )
@@ -1389,7 +1598,9 @@ async def send_bulletin(
     attachment: Optional[BufferedIOBase] = None,
     is_automated: bool = False,
     is_test: bool = False,
-):
+    channels: Optional[Iterable[int]] = None,
+    urgent: bool = False,
+) -> List[Message]:
     if is_automated:
         message = "(automated message)\n" + message
     if is_test:
@@ -1398,39 +1609,24 @@ async def send_bulletin(
             + message
             + "\n**The above bulletin is only a test. Please disregard.**"
         )
-    for guild in bot.guilds:
-        if attachment is not None:
-            attachment.seek(0)
-        channel_id = server_vars.get("bulletin_channel", guild.id)
-        if channel_id is None:
-            continue
-        channel = bot.get_channel(channel_id)
-        if channel is None:
-            continue
-        if attachment is None:
-            if len(message) < 2000:
-                await channel.send(message)
-            else:
-                with open("tmp.txt", "wb+") as fp:
-                    fp.write(message.encode("utf-8"))
-                    fp.seek(0)
-                    await channel.send(
-                        f"NWSMonitor tried to send a bulletin that was too long. \
-The bulletin has been sent as a file.",
-                        file=discord.File(fp),
-                    )
-        else:
-            if len(message) < 2000:
-                await channel.send(message, file=discord.File(attachment))
-            else:
-                with open("tmp.txt", "wb+") as fp:
-                    fp.write(message.encode("utf-8"))
-                    fp.seek(0)
-                    await channel.send(
-                        f"NWSMonitor tried to send a bulletin that was too long. \
-The bulletin has been sent as a file.",
-                        files=[discord.File(fp), discord.File(attachment)],
-                    )
+    attachments = []
+    if len(message) >= 2000:
+        attachments.append(("tmp.txt", message.encode("utf-8")))
+        message = "NWSMonitor tried to send a bulletin that was too long. \
+The bulletin has been sent as a file."
+    if attachment is not None:
+        attachment.seek(0)
+        name = pathlib.Path(getattr(attachment, "name", "file")).name
+        attachments.append((name, attachment.read()))
+    if channels is None:
+        channels = (
+            server_vars.get("bulletin_channel", guild.id) for guild in bot.guilds
+        )
+    return [
+        delivery.enqueue(channel_id, message, attachments, urgent=urgent)
+        for channel_id in channels
+        if channel_id is not None
+    ]
 
 
 @bot.slash_command(name="send_bulletin", description="Announce something")
@@ -1479,47 +1675,29 @@ async def resend_alert(
     ctx: discord.ApplicationContext, alert: Option(str, "Alert ID")  # type: ignore
 ):
     await ctx.defer(ephemeral=True)
-    if alert in TEST_ALERTS:
-        alert_dict = TEST_ALERTS[alert]
-    else:
-        alerts_list = global_vars.get("prev_alerts_list")
-        if alerts_list is None:
-            await ctx.respond("No alerts in cache.")
-            return
-        alerts_list = DataFrame(alerts_list)
-        consolidated_alert = alerts_list[alerts_list["id"] == alert]
-        if consolidated_alert.empty:
-            await ctx.respond("Alert not found.")
-            return
-        alert_dict = consolidated_alert.to_dict("list")
-
-    alert_2d_list = [
-        [
-            alert_dict["id"][0],
-            alert_dict["areaDesc"][0],
-            alert_dict["sent"][0],
-            alert_dict["onset"][0],
-            alert_dict["ends"][0],
-            alert_dict["messageType"][0],
-            alert_dict["event"][0],
-            alert_dict["senderName"][0],
-            alert_dict["headline"][0],
-            alert_dict["description"][0],
-            alert_dict["instruction"][0],
-            alert_dict["parameters"][0],
-            alert_dict["expires"][0],
-        ]
-    ]
-    consolidated_alert = DataFrame(alert_2d_list)
-
     if alert in TEST_ALERTS:
         cog: NWSMonitor = bot.get_cog("NWSMonitor")
         await cog.update_alerts(test_id=alert)
-    else:
-        for guild in bot.guilds:
-            channel_id = server_vars.get("monitor_channel", guild.id)
-            if channel_id is not None:
-                await send_alerts(guild.id, channel_id, consolidated_alert)
+        await ctx.respond("Alert sent.")
+        return
+    cog: Optional[NWSMonitor] = bot.get_cog("NWSMonitor")
+    alerts_list = cog.alerts_list if cog is not None else None
+    found = []
+    if alerts_list is not None:
+        found = nws.Alert.from_frame(alerts_list[alerts_list["id"] == alert])
+    if not found:
+        # Not in the last poll, e.g. after a restart or for an older
+        # cancellation. The API keeps alerts for about a week.
+        alerts_list = await nws.alert_by_id(alert)
+        if alerts_list is not None:
+            found = nws.Alert.from_frame(alerts_list)
+    if not found:
+        await ctx.respond("Alert not found.")
+        return
+    for guild in bot.guilds:
+        channel_id = server_vars.get("monitor_channel", guild.id)
+        if channel_id is not None:
+            await send_alerts(guild.id, channel_id, found[:1])
     await ctx.respond("Alert sent.")
 
 
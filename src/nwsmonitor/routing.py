@@ -0,0 +1,59 @@
+"""Route alerts to the guilds that want them."""
+
+import logging
+from collections import defaultdict
+from typing import Dict, Iterable, Optional, Set
+from . import server_vars
+
+_log = logging.getLogger(__name__)
+
+
+class SubscriptionIndex:
+    """
+    Inverted indexes from event type and WFO to guilds, built from each
+    guild's filters. Rebuilt only when the settings or the set of guilds
+    change.
+    """
+
+    def __init__(self) -> None:
+        self.generation: Optional[int] = None
+        self.guild_ids: frozenset = frozenset()
+        self.channels: Dict[int, int] = {}  # guild -> monitor channel
+        self.bulletin_channels: Dict[int, int] = {}  # guild -> bulletin channel
+        self.unrestricted: Set[int] = set()  # guilds without a WFO list
+        self.allowed_wfos: Dict[str, Set[int]] = defaultdict(set)
+        self.excluded_wfos: Dict[str, Set[int]] = defaultdict(set)
+        self.excluded_events: Dict[str, Set[int]] = defaultdict(set)
+
+    def refresh(self, guild_ids: Iterable[int]) -> None:
+        guild_ids = frozenset(guild_ids)
+        if self.generation == server_vars.generation and self.guild_ids == guild_ids:
+            return
+        self.__init__()
+        self.generation = server_vars.generation
+        self.guild_ids = guild_ids
+        for guild_id in guild_ids:
+            channel_id = server_vars.get("monitor_channel", guild_id)
+            if channel_id is not None:
+                self.channels[guild_id] = channel_id
+            channel_id = server_vars.get("bulletin_channel", guild_id)
+            if channel_id is not None:
+                self.bulletin_channels[guild_id] = channel_id
+            wfo_list = server_vars.get("wfo_list", guild_id)
+            if wfo_list:
+                for wfo in wfo_list:
+                    self.allowed_wfos[wfo].add(guild_id)
+            else:
+                self.unrestricted.add(guild_id)
+            for wfo in server_vars.get("exclude_wfos", guild_id) or []:
+                self.excluded_wfos[wfo].add(guild_id)
+            for event in server_vars.get("exclude_alerts", guild_id) or []:
+                self.excluded_events[event].add(guild_id)
+        _log.debug(f"Rebuilt subscription index for {len(guild_ids)} guild(s)")
+
+    def route(self, event: str, wfo: str) -> Set[int]:
+        """The guilds that should receive an alert."""
+        guilds = self.unrestricted | self.allowed_wfos.get(wfo, set())
+        guilds -= self.excluded_wfos.get(wfo, set())
+        guilds -= self.excluded_events.get(event, set())
+        return guilds
@@ -0,0 +1,83 @@
+"""Adaptive polling intervals driven by alert activity."""
+
+import logging
+from dataclasses import dataclass, replace
+from typing import Optional
+from pandas import DataFrame
+from .enums import AlertType
+
+# Short-fuse warnings that warrant polling as fast as allowed
+CONVECTIVE_WARNINGS = frozenset(
+    {
+        AlertType.TOR.value,
+        AlertType.SVR.value,
+        AlertType.FFW.value,
+        AlertType.EWW.value,
+        AlertType.SQW.value,
+    }
+)
+CONVECTIVE_WATCHES = frozenset({AlertType.TOA.value, AlertType.SVA.value})
+_log = logging.getLogger(__name__)
+
+
+@dataclass
+class PollingPolicy:
+    # All in seconds
+    min_interval: float = 15.0  # convective warnings are in effect
+    watch_interval: float = 30.0  # convective watches are in effect
+    interval: float = 60.0  # something changed last time
+    max_interval: float = 120.0
+    # Growth per poll with no changes, and per failed poll
+    backoff: float = 1.5
+    failure_backoff: float = 2.0
+
+
+policy = PollingPolicy()
+
+
+def configure(**kwargs) -> None:
+    """Override fields of the global policy, e.g. from the config file."""
+    global policy
+    for name in kwargs:
+        if not hasattr(policy, name):
+            raise ValueError(f"Unknown polling setting: {name}")
+    new = replace(policy, **{name: float(value) for name, value in kwargs.items()})
+    if not new.min_interval <= new.interval <= new.max_interval:
+        raise ValueError("Polling intervals must satisfy min <= interval <= max")
+    policy = new
+
+
+def count_events(alerts: Optional[DataFrame], events: frozenset) -> int:
+    if alerts is None or alerts.empty:
+        return 0
+    return int(alerts["event"].isin(events).sum())
+
+
+class AdaptiveInterval:
+    """The delay before the next poll, updated after every poll."""
+
+    def __init__(self) -> None:
+        self.current = policy.interval
+        self.failures = 0
+
+    def _clamp(self, interval: float) -> float:
+        return min(max(interval, policy.min_interval), policy.max_interval)
+
+    def after_poll(self, alerts: Optional[DataFrame], changed: bool) -> float:
+        self.failures = 0
+        if count_events(alerts, CONVECTIVE_WARNINGS):
+            interval = policy.min_interval
+        elif count_events(alerts, CONVECTIVE_WATCHES):
+            interval = policy.watch_interval
+        elif changed:
+            interval = policy.interval
+        else:
+            interval = max(self.current, policy.interval) * policy.backoff
+        self.current = self._clamp(interval)
+        return self.current
+
+    def after_failure(self) -> float:
+        self.failures += 1
+        interval = max(self.current, policy.interval) * policy.failure_backoff
+        self.current = self._clamp(interval)
+        return self.current
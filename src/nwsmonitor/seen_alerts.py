@@ -0,0 +1,155 @@
+"""
+Which alerts have already been processed, kept in memory and mirrored to a
+small SQLite database so that a restart doesn't resend everything.
+"""
+
+import time
+import sqlite3
+import logging
+from typing import Dict, Iterable, List, Optional
+from pandas import DataFrame
+from . import alert_diff
+from . import global_vars
+from .aio_nws import Alert
+from .aio_nws.stream import ALERT_FIELDS
+
+db_file = "seenAlerts.sqlite3"
+# Rows whose alert expired longer ago than this are dropped on load.
+EXPIRED_RETENTION = 24 * 60 * 60  # seconds
+_log = logging.getLogger(__name__)
+_db: Optional[sqlite3.Connection] = None
+_fingerprints: Optional[Dict[str, str]] = None
+# Cancellation ID -> sent time. Cancellations are polled incrementally, so
+# they are kept until `prune_cancels` drops them rather than whenever they
+# are missing from a poll.
+_cancels: Dict[str, Optional[float]] = {}
+
+
+def _connect() -> sqlite3.Connection:
+    global _db
+    if _db is None:
+        _db = sqlite3.connect(db_file)
+        _db.execute(
+            "CREATE TABLE IF NOT EXISTS seen ("
+            "id TEXT PRIMARY KEY, fingerprint TEXT, sent REAL, expires REAL, "
+            "cancel INTEGER)"
+        )
+        _db.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        _db.commit()
+    return _db
+
+
+def _timestamp(dt) -> Optional[float]:
+    return dt.timestamp() if dt is not None else None
+
+
+def _rows(alerts: Iterable[Alert], fingerprints: Dict[str, str]) -> List[tuple]:
+    return [
+        (
+            alert.id,
+            fingerprints[alert.id],
+            _timestamp(alert.sent_time),
+            _timestamp(alert.expires_time),
+            alert.message_type == "Cancel",
+        )
+        for alert in alerts
+    ]
+
+
+def _migrate(db: sqlite3.Connection) -> None:
+    """Import the state that used to be kept in globalVars.json."""
+    prev_alerts_list = global_vars.get("prev_alerts_list")
+    if prev_alerts_list is None:
+        return
+    # The old list kept every field of the response; polls now keep only
+    # ALERT_FIELDS, so compare like with like.
+    prev_alerts_list = DataFrame(prev_alerts_list).reindex(columns=list(ALERT_FIELDS))
+    fingerprints = alert_diff.fingerprints(prev_alerts_list)
+    rows = _rows(Alert.from_frame(prev_alerts_list), fingerprints)
+    db.executemany("INSERT OR REPLACE INTO seen VALUES (?, ?, ?, ?, ?)", rows)
+    db.execute("INSERT OR REPLACE INTO meta VALUES ('initialized', '1')")
+    db.commit()
+    global_vars.write("prev_alerts_list", None)
+    _log.info(f"Migrated {len(rows)} previously seen alert(s) to {db_file}")
+
+
+def load() -> Optional[Dict[str, str]]:
+    """
+    Alert ID -> fingerprint as of the last poll, or None if alerts have
+    never been polled.
+    """
+    global _fingerprints, _cancels
+    if _fingerprints is not None:
+        return _fingerprints
+    db = _connect()
+    if db.execute("SELECT 1 FROM meta WHERE key = 'initialized'").fetchone() is None:
+        _migrate(db)
+    if db.execute("SELECT 1 FROM meta WHERE key = 'initialized'").fetchone() is None:
+        return None
+    db.execute("DELETE FROM seen WHERE expires < ?", (time.time() - EXPIRED_RETENTION,))
+    db.commit()
+    _fingerprints = dict(db.execute("SELECT id, fingerprint FROM seen"))
+    _cancels = dict(db.execute("SELECT id, sent FROM seen WHERE cancel"))
+    return _fingerprints
+
+
+def update(
+    fresh: Iterable[Alert], fingerprints: Dict[str, str], removed: Iterable[str]
+) -> None:
+    """
+    Record the result of a poll, writing only what changed. Removed IDs of
+    recorded cancellations are ignored; see `prune_cancels`.
+    """
+    global _fingerprints
+    if _fingerprints is None:
+        _fingerprints = {}
+    rows = _rows(fresh, fingerprints)
+    removed = [i for i in removed if i not in _cancels]
+    db = _connect()
+    db.executemany("INSERT OR REPLACE INTO seen VALUES (?, ?, ?, ?, ?)", rows)
+    db.executemany("DELETE FROM seen WHERE id = ?", ((i,) for i in removed))
+    db.execute("INSERT OR REPLACE INTO meta VALUES ('initialized', '1')")
+    db.commit()
+    for alert_id, print_, sent, _, cancel in rows:
+        _fingerprints[alert_id] = print_
+        if cancel:
+            _cancels[alert_id] = sent
+    for alert_id in removed:
+        _fingerprints.pop(alert_id, None)
+
+
+def prune_cancels(before: float) -> None:
+    """Forget cancellations sent before the given UNIX timestamp."""
+    old = [i for i, sent in _cancels.items() if sent is None or sent < before]
+    if not old:
+        return
+    db = _connect()
+    db.executemany("DELETE FROM seen WHERE id = ?", ((i,) for i in old))
+    db.commit()
+    for alert_id in old:
+        del _cancels[alert_id]
+        if _fingerprints is not None:
+            _fingerprints.pop(alert_id, None)
+
+
+def cancels() -> Dict[str, Optional[float]]:
+    """Recorded cancellation IDs and when they were sent, as UNIX timestamps."""
+    load()
+    return dict(_cancels)
+
+
+def latest_cancel() -> Optional[float]:
+    """When the newest recorded cancellation was sent, as a UNIX timestamp."""
+    return _connect().execute("SELECT MAX(sent) FROM seen WHERE cancel").fetchone()[0]
+
+
+def clear() -> None:
+    global _fingerprints
+    db = _connect()
+    db.execute("DELETE FROM seen")
+    db.execute("DELETE FROM meta")
+    db.commit()
+    _fingerprints = None
+    _cancels.clear()
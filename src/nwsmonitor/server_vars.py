@@ -6,9 +6,13 @@ from typing import Any
 
 log = logging.getLogger(__name__)
 json_file = "serverVars.json"
+# Bumped on every change so that caches built from these settings can tell
+# when they are stale.
+generation = 0
 
 
 def write(var_name: str, value: Any, guild: int) -> None:
+    global generation
     # if the json file exists, load it, otherwise initialize a blank dict
     guild = str(guild)
     try:
@@ -26,6 +30,7 @@ def write(var_name: str, value: Any, guild: int) -> None:
             data[guild] = {var_name: value}
     with open(json_file, "w") as f:
         f.write(json.dumps(data, indent=4))
+    generation += 1
 
 
 def get(var_name: str, guild: int) -> Any:
@@ -44,6 +49,7 @@ def get(var_name: str, guild: int) -> Any:
 
 
 def remove_guild(guild: int) -> None:
+    global generation
     guild = str(guild)
     try:
         with open(json_file, "r") as f:
@@ -58,3 +64,4 @@ def remove_guild(guild: int) -> None:
     else:
         with open(json_file, "w") as f:
             f.write(json.dumps(data, indent=4))
+        generation += 1
@@ -0,0 +1,79 @@
+import json
+import unittest
+from typing import Any, List, Tuple
+from nwsmonitor.aio_nws.stream import GraphSplitter
+
+GRAPH = [
+    {"id": "a", "headline": 'Quoted "words" and {braces} and [brackets]'},
+    {"id": "b", "description": 'Backslashes \\ and \\" and a trailing \\'},
+    {
+        "id": "c",
+        "parameters": {"VTEC": ["/O.NEW.KOUN.TO.W.0042.240504T2300Z-240505T0000Z/"]},
+        "nested": [{"x": [1, 2, {"y": "}"}]}, []],
+    },
+    {"id": "d", "unicode": "°F \\u00b0F"},
+]
+DOCUMENT = json.dumps(
+    {
+        "@context": ["https://geojson.org/geojson-ld/geojson-context.jsonld"],
+        "note": 'A string mentioning "@graph": [{"id": "not this"}]',
+        "nested": {"@graph": [{"id": "not this either"}]},
+        "@graph": GRAPH,
+        "title": "Trailing keys are ignored",
+        "pagination": {"next": "https://api.weather.gov/alerts?cursor=x"},
+    }
+).encode()
+
+
+def split(document: bytes, chunk_size: int) -> Tuple[GraphSplitter, List[Any]]:
+    """Feed `document` in chunks and decode the objects that come out."""
+    splitter = GraphSplitter()
+    objects = []
+    for i in range(0, len(document), chunk_size):
+        objects += [json.loads(o) for o in splitter.feed(document[i : i + chunk_size])]
+    return splitter, objects
+
+
+class TestGraphSplitter(unittest.TestCase):
+    def test_chunk_boundaries(self):
+        for chunk_size in (1, 3, 7, 1000):
+            with self.subTest(chunk_size=chunk_size):
+                splitter, objects = split(DOCUMENT, chunk_size)
+                self.assertTrue(splitter.found)
+                self.assertTrue(splitter.done)
+                self.assertEqual(objects, GRAPH)
+
+    def test_escapes_split_across_chunks(self):
+        document = json.dumps({"@graph": [{"s": '\\"}' * 5}, {"s": "\\\\"}]}).encode()
+        for chunk_size in range(1, 8):
+            with self.subTest(chunk_size=chunk_size):
+                splitter, objects = split(document, chunk_size)
+                self.assertEqual(objects, [{"s": '\\"}' * 5}, {"s": "\\\\"}])
+
+    def test_empty_graph(self):
+        splitter, objects = split(b'{"@graph": [], "title": "none"}', 3)
+        self.assertTrue(splitter.found)
+        self.assertTrue(splitter.done)
+        self.assertEqual(objects, [])
+
+    def test_no_graph(self):
+        splitter, objects = split(b'{"features": [{"id": "a"}]}', 3)
+        self.assertFalse(splitter.found)
+        self.assertEqual(objects, [])
+
+    def test_truncated(self):
+        splitter, objects = split(DOCUMENT[: DOCUMENT.index(b'"id": "c"')], 7)
+        self.assertTrue(splitter.found)
+        self.assertFalse(splitter.done)
+        self.assertEqual(objects, GRAPH[:2])
+
+    def test_buffer_is_bounded(self):
+        splitter = GraphSplitter()
+        splitter.feed(b'{"@graph": [')
+        for _ in range(100):
+            splitter.feed(json.dumps({"id": "x" * 100}).encode() + b", ")
+        self.assertLess(len(splitter._buf), 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import datetime
+import unittest
+from nwsmonitor.aio_nws import vtec
+from nwsmonitor.aio_nws.vtec import EventKey, HVtec, Vtec
+
+UTC = datetime.timezone.utc
+TOR = "/O.{}.KOUN.TO.W.0042.240504T2300Z-240505T0000Z/"
+# A flood warning: one event extended, another cancelled, plus its H-VTEC
+FLW = [
+    "/O.EXT.KDMX.FL.W.0012.000000T0000Z-240508T1200Z/",
+    "/O.CAN.KDMX.FL.W.0011.000000T0000Z-240505T0600Z/",
+    "/MSSM5.2.ER.240504T1200Z.240505T0600Z.000000T0000Z.NR/",
+]
+
+
+def sent(minutes: int) -> datetime.datetime:
+    return datetime.datetime(2024, 5, 4, 23, minutes, tzinfo=UTC)
+
+
+class TestParse(unittest.TestCase):
+    def test_actions(self):
+        for action in ("NEW", "CON", "EXT", "CAN", "EXP"):
+            with self.subTest(action=action):
+                parsed = vtec.parse(TOR.format(action))
+                self.assertEqual(
+                    parsed,
+                    Vtec(
+                        "O",
+                        action,
+                        "KOUN",
+                        "TO",
+                        "W",
+                        42,
+                        datetime.datetime(2024, 5, 4, 23, 0, tzinfo=UTC),
+                        datetime.datetime(2024, 5, 5, 0, 0, tzinfo=UTC),
+                    ),
+                )
+                self.assertEqual(parsed.key, EventKey("KOUN", "TO", "W", 42))
+
+    def test_until_further_notice(self):
+        parsed = vtec.parse(FLW[0])
+        self.assertIsNone(parsed.begin)
+        self.assertEqual(parsed.end, datetime.datetime(2024, 5, 8, 12, 0, tzinfo=UTC))
+
+    def test_hvtec(self):
+        self.assertEqual(
+            vtec.parse(FLW[2]),
+            HVtec(
+                "MSSM5",
+                "2",
+                "ER",
+                datetime.datetime(2024, 5, 4, 12, 0, tzinfo=UTC),
+                datetime.datetime(2024, 5, 5, 6, 0, tzinfo=UTC),
+                None,
+                "NR",
+            ),
+        )
+
+    def test_invalid(self):
+        for value in (
+            "",
+            "not a vtec",
+            "/O.NEW.KOUN.TO.W.ABCD.240504T2300Z-240505T0000Z/",
+            "/O.NEW.KOUN.TO.W.0042.240504T2300Z/",
+            "/O.NEW.KOUN.TO.W.0042.240504T2300Z-24050/",
+        ):
+            with self.subTest(value=value):
+                self.assertIsNone(vtec.parse(value))
+
+    def test_several_lines(self):
+        pvtecs, hvtecs = vtec.parse_all(FLW + ["garbage"])
+        self.assertEqual(
+            [(v.action, v.etn) for v in pvtecs], [("EXT", 12), ("CAN", 11)]
+        )
+        self.assertEqual([h.nwsli for h in hvtecs], ["MSSM5"])
+
+
+class TestEventTracker(unittest.TestCase):
+    def setUp(self):
+        self.tracker = vtec.EventTracker()
+        self.key = EventKey("KOUN", "TO", "W", 42)
+
+    def observe(self, alert_id: str, action: str, minutes: int) -> bool:
+        parsed = vtec.parse(TOR.format(action))
+        return self.tracker.observe(alert_id, [parsed], sent(minutes))
+
+    def test_life_cycle(self):
+        self.assertTrue(self.observe("a", "NEW", 0))
+        self.assertTrue(self.observe("b", "CON", 10))
+        self.assertFalse(self.tracker.get(self.key).ended)
+        self.assertTrue(self.observe("c", "CAN", 20))
+        self.assertTrue(self.tracker.get(self.key).ended)
+        self.assertEqual(self.tracker.get(self.key).action, "CAN")
+
+    def test_expiry_after_cancellation_is_redundant(self):
+        self.observe("a", "NEW", 0)
+        self.observe("b", "CAN", 20)
+        self.assertFalse(self.observe("c", "EXP", 30))
+        self.assertEqual(self.tracker.collapsed, 1)
+
+    def test_same_alert_again(self):
+        self.observe("a", "NEW", 0)
+        self.observe("b", "CAN", 20)
+        self.assertTrue(self.observe("b", "CAN", 20))
+        self.assertEqual(len(self.tracker.get(self.key).history), 2)
+
+    def test_partial_cancellation(self):
+        self.observe("a", "NEW", 0)
+        self.observe("b", "CAN", 20)
+        self.observe("c", "CON", 20)
+        self.assertFalse(self.tracker.get(self.key).ended)
+
+    def test_prune(self):
+        self.observe("a", "NEW", 0)
+        self.observe("b", "CAN", 20)
+        self.tracker.prune(sent(20) + vtec.RETENTION / 2)
+        self.assertIsNotNone(self.tracker.get(self.key))
+        self.tracker.prune(sent(21) + vtec.RETENTION)
+        self.assertIsNone(self.tracker.get(self.key))
+
+
+if __name__ == "__main__":
+    unittest.main()